@@ -19,6 +19,18 @@ if __name__ == "__main__":
         result = solve.main(sys.argv[2:])
         visualize.visualize(result, game_parse.get_docs(),
                             image_file='test.svg', dot_file='test.dot')
+    elif len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        from . import solve
+        solve.batch_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'sweep':
+        from . import sweep
+        sweep.main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'icons':
+        from . import gui_icons
+        gui_icons.main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        from . import bench
+        bench.main(sys.argv[2:])
     else:
         from . import gui_main
         gui = gui_main.SatisfactorySolverMain(sys.argv)
@@ -0,0 +1,414 @@
+import argparse
+import json
+import re
+import time
+import tracemalloc
+
+import yaml
+
+from . import game_parse, search, solve
+from .config import AlternateRecipeConfiguration
+from .resources import ItemRate
+
+RAW_INPUT_RATE = 600
+
+
+def default_problems(game_data):
+    """One problem per producible item, fed by every raw resource"""
+    produced = set()
+    for recipe in game_data.recipes.values():
+        produced.update(recipe.outputs)
+    raw = sorted(item_id for item_id in game_data.items if item_id not in produced)
+    inputs = [ItemRate(item_id, RAW_INPUT_RATE) for item_id in raw]
+    return [solve.Problem(item_id, inputs) for item_id in sorted(produced)
+            if item_id in game_data.items]
+
+
+def load_problems(game_data, plan_paths):
+    if not plan_paths:
+        return default_problems(game_data)
+    problems = []
+    for plan_path in plan_paths:
+        with open(plan_path, 'r') as file:
+            problems.append(solve.Problem.from_dict(yaml.safe_load(file)))
+    return problems
+
+
+def all_recipes(game_data):
+    return AlternateRecipeConfiguration({
+        recipe_id: True for recipe_id in game_data.recipes
+    })
+
+
+def report(label, seconds, count=None):
+    line = f"{label:<28} {seconds * 1000:10.2f} ms"
+    if count:
+        line += f" ({seconds * 1000 / count:.2f} ms / solve)"
+    print(line)
+
+
+def target_production(result):
+    if result is None:
+        return None
+    return sum(
+        ir.rate * result.problem.targets[ir.resource] for ir in result.outputs
+        if ir.resource in result.problem.targets
+    )
+
+
+def bench_backends(args):
+    game_data = game_parse.get_docs()
+    recipe_config = all_recipes(game_data)
+    problems = load_problems(game_data, args.plans)
+    print(f"{len(problems)} problems, {len(game_data.recipes)} recipes")
+    baseline = None
+    for backend in args.backends:
+        start = time.perf_counter()
+        model = solve.compile_model(game_data, recipe_config, backend)
+        report(f"{backend} compile", time.perf_counter() - start)
+        latencies = []
+        productions = []
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for problem in problems:
+                solve_start = time.perf_counter()
+                result = model.solve(problem)
+                latencies.append(time.perf_counter() - solve_start)
+                productions.append(target_production(result))
+        report(f"{backend} solve", time.perf_counter() - start,
+               len(problems) * args.repeat)
+        latencies.sort()
+        if latencies:
+            report(f"{backend} p50", latencies[len(latencies) // 2])
+            report(f"{backend} p95", latencies[min(len(latencies) - 1, len(latencies) * 95 // 100)])
+
+        # Every backend should find the same optimum as the first one
+        if baseline is None:
+            baseline = productions
+        else:
+            mismatches = sum(
+                1 for ours, theirs in zip(productions, baseline)
+                if (ours is None) != (theirs is None)
+                or (ours is not None and abs(ours - theirs) > 1e-6 * max(1, abs(theirs)))
+            )
+            if mismatches:
+                print(f"{backend}: {mismatches} results differ from {args.backends[0]}")
+
+
+def bench_startup(args):
+    yaml_file = args.yaml_path + "game_data.yaml"
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        game_data = game_parse.load_yaml(yaml_file)
+    yaml_time = (time.perf_counter() - start) / args.repeat
+    report("yaml load", yaml_time)
+
+    game_parse.export_binary(game_data, 'yaml', game_parse.file_stamp(yaml_file), args.yaml_path)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        game_parse.load_binary(args.yaml_path, args.doc_path)
+    binary_time = (time.perf_counter() - start) / args.repeat
+    report("binary load", binary_time)
+    print(f"speedup x{yaml_time / binary_time:.1f}")
+
+
+def bench_parse(args):
+    for streaming in (False, True):
+        label = "streaming" if streaming else "json.load"
+        start = time.perf_counter()
+        game_parse.scrape_docs(args.doc_path, streaming=streaming)
+        report(f"{label} parse", time.perf_counter() - start)
+
+        tracemalloc.start()
+        game_parse.scrape_docs(args.doc_path, streaming=streaming)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label + ' peak':<28} {peak / 2**20:10.2f} MiB")
+
+
+LEGACY_PAR_PAT = re.compile(r"\((.*)\)")
+LEGACY_AMT_PAT = re.compile(r"\(.*?\.(.+?)\"',Amount=(\d+)\)")
+
+
+def legacy_parse_item_amount(str):
+    """The regex scanner parse_ue_text replaced, kept as a baseline"""
+    amt_dict = {}
+    search_start = 0
+    par_str = LEGACY_PAR_PAT.fullmatch(str)[1]
+    while search_start < len(par_str):
+        m = LEGACY_AMT_PAT.search(par_str, search_start)
+        amt_dict[m[1]] = int(m[2])
+        search_start = m.end()
+    return amt_dict
+
+
+def bench_tokenizer(args):
+    sections = dict(game_parse.iter_sections(
+        args.doc_path, (game_parse.RECIPE_CLASS,)))
+    amounts = [
+        amount for node in sections[game_parse.RECIPE_CLASS]
+        for amount in (node["mIngredients"], node["mProduct"])
+    ]
+    print(f"{len(amounts)} amount strings")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for amount in amounts:
+            legacy_parse_item_amount(amount)
+    report("regex scan", (time.perf_counter() - start) / args.repeat)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for amount in amounts:
+            game_parse.Recipe.parse_item_amount(amount, {})
+    report("parse_item_amount", (time.perf_counter() - start) / args.repeat)
+
+    # What amounts that miss parse_item_amount's fast path fall back to
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for amount in amounts:
+            game_parse.parse_ue_text(amount)
+    report("ue tokenizer", (time.perf_counter() - start) / args.repeat)
+
+
+def keystroke_latencies(search_fn, queries, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            for end in range(1, len(query) + 1):
+                start = time.perf_counter()
+                search_fn(query[:end])
+                latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies
+
+
+def bench_search(args):
+    from rapidfuzz import fuzz, process, utils
+    game_data = game_parse.get_docs()
+    start = time.perf_counter()
+    entries = search.item_entries(game_data)
+    index = search.SearchIndex(entries)
+    report("index build", time.perf_counter() - start)
+    names = list(entries)
+    queries = args.queries or sorted(item.display for item in game_data.items.values())
+    print(f"{len(names)} names, {len(queries)} queries typed a key at a time")
+
+    def full_scan(term):
+        # What the completer did before the index, on the same scorer
+        return process.extract(term, names, scorer=fuzz.WRatio,
+                               processor=utils.default_process, limit=20)
+
+    for label, search_fn in (("full scan", full_scan), ("index", index.search)):
+        latencies = keystroke_latencies(search_fn, queries, args.repeat)
+        report(f"{label} p50", latencies[len(latencies) // 2])
+        report(f"{label} p95", latencies[len(latencies) * 95 // 100])
+        report(f"{label} max", latencies[-1])
+
+
+def legacy_apply_config(model, config):
+    """What from_recipe_config did before apply_states, kept as a baseline"""
+    from PySide6.QtCore import Qt
+    for child in model.root_item.children:
+        model.dfs(child, Qt.Unchecked)
+    for recipe_id, enabled in config.enabled_recipes.items():
+        if enabled:
+            model.propagate_check(model.item_lookup[recipe_id], True)
+
+
+def bench_recipe_tree(args):
+    import PySide6.QtWidgets as qtw
+    from .gui_recipes import AlternateRecipeWindow, TreeModel
+    app = qtw.QApplication.instance() or qtw.QApplication([])
+    game_data = game_parse.get_docs()
+    start = time.perf_counter()
+    model = TreeModel(AlternateRecipeWindow.build_tree(game_data))
+    report("tree build", time.perf_counter() - start)
+    view = qtw.QTreeView()
+    view.setModel(model)
+    view.expandAll()
+    signals = []
+    model.dataChanged.connect(lambda *_: signals.append('dataChanged'))
+    model.modelReset.connect(lambda: signals.append('modelReset'))
+
+    configs = {
+        'all enabled': all_recipes(game_data),
+        'no alternates': AlternateRecipeConfiguration({
+            recipe.id: recipe.unlock[0] != 'Alternate Recipes'
+            for recipe in game_data.recipes.values()
+        }),
+    }
+    print(f"{len(model.item_lookup)} recipes")
+    for name, config in configs.items():
+        for label, apply in (
+                ("per recipe", lambda: legacy_apply_config(model, config)),
+                ("batched", lambda: model.apply_states(
+                    lambda recipe_id: config.enabled_recipes.get(recipe_id, False)))):
+            elapsed = 0
+            for _ in range(args.repeat):
+                model.apply_states(
+                    lambda recipe_id: not config.enabled_recipes.get(recipe_id, False))
+                # A reset collapses the view, time both against the expanded tree
+                view.expandAll()
+                app.processEvents()
+                signals.clear()
+                start = time.perf_counter()
+                apply()
+                app.processEvents()
+                elapsed += time.perf_counter() - start
+            report(f"{name}, {label}", elapsed / args.repeat)
+            for signal in ('dataChanged', 'modelReset'):
+                print(f"{'':<28} {signals.count(signal):10d} {signal}")
+
+
+class LegacyItemRate:
+    """ItemRate before __slots__, kept as a baseline"""
+
+    def __init__(self, resource, rate):
+        self.resource = resource
+        self.rate = rate
+
+
+class LegacyItem:
+    def __init__(self, display, id, description, form, icon, solid):
+        self.display = display
+        self.id = id
+        self.description = description
+        self.form = form
+        self.icon = icon
+        self.solid = solid
+
+
+class LegacyRecipe:
+    """Recipe before __slots__ and cached rates, building its rates on every call"""
+
+    def __init__(self, display, id, inputs, outputs, machine, duration, unlock):
+        self.display = display
+        self.id = id
+        self.inputs = inputs
+        self.outputs = outputs
+        self.machine = machine
+        self.duration = duration
+        self.unlock = unlock
+
+    def input_rates(self):
+        return [
+            LegacyItemRate(resource_id, amount / self.duration) for resource_id, amount in self.inputs.items()
+        ]
+
+    def output_rates(self):
+        return [
+            LegacyItemRate(resource_id, amount / self.duration) for resource_id, amount in self.outputs.items()
+        ]
+
+    def get_rates(self):
+        return [
+            LegacyItemRate(resource_id, -amount / self.duration) for resource_id, amount in self.inputs.items()
+        ] + [
+            LegacyItemRate(resource_id, amount / self.duration) for resource_id, amount in self.outputs.items()
+        ]
+
+
+class LegacyMachine:
+    def __init__(self, display, id, description, power, icon):
+        self.display = display
+        self.id = id
+        self.description = description
+        self.power = power
+        self.icon = icon
+
+
+def legacy_game_data(d):
+    return game_parse.GameData(
+        {id: LegacyItem(**item) for id, item in d['items'].items()},
+        {id: LegacyRecipe(**recipe) for id, recipe in d['recipes'].items()},
+        {id: LegacyMachine(**machine) for id, machine in d['machines'].items()})
+
+
+def traced(build):
+    """What build() returns, and the memory it still holds on to"""
+    tracemalloc.start()
+    built = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return built, current
+
+
+def bench_memory(args):
+    game_data = game_parse.get_docs()
+    # Fresh strings for every field, like a yaml load hands back
+    encoded = json.dumps(game_data.to_dict())
+    slotted, slotted_size = traced(lambda: game_parse.GameData.from_dict(json.loads(encoded)))
+    legacy, legacy_size = traced(lambda: legacy_game_data(json.loads(encoded)))
+    print(f"{len(slotted.items)} items, {len(slotted.recipes)} recipes, "
+          f"{len(slotted.machines)} machines")
+    print(f"{'game data':<28} {slotted_size / 2**10:10.2f} KiB, "
+          f"{legacy_size / 2**10:.2f} KiB unslotted")
+
+    for label, data in (("rates pass", slotted), ("unslotted rates pass", legacy)):
+        recipes = list(data.recipes.values())
+
+        def rates_pass():
+            return [(recipe.input_rates(), recipe.output_rates(), recipe.get_rates())
+                    for recipe in recipes]
+
+        rates_pass()
+        _, kept = traced(rates_pass)
+        print(f"{label:<28} {kept / 2**10:10.2f} KiB kept")
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            rates_pass()
+        report(label, (time.perf_counter() - start) / args.repeat)
+
+
+def main(args):
+    parser = argparse.ArgumentParser(prog='python -m solver bench')
+    benches = parser.add_subparsers(dest='bench', required=True)
+
+    backends = benches.add_parser(
+        'backends', help='Solve latency of each LP backend')
+    backends.add_argument('plans', nargs='*',
+                          help='Factory plan files, defaults to every producible item')
+    backends.add_argument('--backends', nargs='+', choices=solve.BACKENDS,
+                          default=list(solve.BACKENDS))
+    backends.add_argument('--repeat', type=int, default=1)
+    backends.set_defaults(run=bench_backends)
+
+    startup = benches.add_parser(
+        'startup', help='Game data load time from YAML and the binary cache')
+    startup.add_argument('--yaml-path', default='./')
+    startup.add_argument('--doc-path', default=game_parse.DOC_JSON_PATH)
+    startup.add_argument('--repeat', type=int, default=5)
+    startup.set_defaults(run=bench_startup)
+
+    parse = benches.add_parser(
+        'parse', help='Docs.json parse time and peak memory, streaming or not')
+    parse.add_argument('--doc-path', default=game_parse.DOC_JSON_PATH)
+    parse.set_defaults(run=bench_parse)
+
+    tokenizer = benches.add_parser(
+        'tokenizer', help='Recipe amount parsing over every recipe in Docs.json')
+    tokenizer.add_argument('--doc-path', default=game_parse.DOC_JSON_PATH)
+    tokenizer.add_argument('--repeat', type=int, default=20)
+    tokenizer.set_defaults(run=bench_tokenizer)
+
+    search_bench = benches.add_parser(
+        'search', help='Per-keystroke latency of the item search')
+    search_bench.add_argument('queries', nargs='*',
+                              help='Search terms, defaults to every item name')
+    search_bench.add_argument('--repeat', type=int, default=3)
+    search_bench.set_defaults(run=bench_search)
+
+    recipe_tree = benches.add_parser(
+        'recipes', help='Loading a recipe config into the enabled recipes tree')
+    recipe_tree.add_argument('--repeat', type=int, default=5)
+    recipe_tree.set_defaults(run=bench_recipe_tree)
+
+    memory = benches.add_parser(
+        'memory', help='GameData footprint and recipe rate allocations')
+    memory.add_argument('--repeat', type=int, default=100)
+    memory.set_defaults(run=bench_memory)
+
+    args = parser.parse_args(args)
+    args.run(args)
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from . import solve
+from .config import config_dir
+
+MEMORY_CACHE_SIZE = 256
+# Bump whenever Result or Problem change what they serialize, so stale disk
+# entries are not reused
+RESULT_CACHE_VERSION = 4
+
+
+def result_cache_dir():
+    return os.path.join(config_dir(), 'result_cache')
+
+
+class ResultCache:
+    """Solve results keyed by a hash of the problem, recipes, game data and backend.
+
+    Results are kept in an in-memory LRU and, when disk_dir is set, also
+    written there as JSON so they survive restarts.
+    """
+
+    def __init__(self, max_size=MEMORY_CACHE_SIZE, disk_dir=None):
+        self.max_size = max_size
+        self.disk_dir = disk_dir
+        self.memory = OrderedDict()
+        if self.disk_dir is not None:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key(problem, game_data, recipe_config, backend=solve.DEFAULT_BACKEND):
+        encoded = json.dumps({
+            'problem': problem.to_dict(),
+            'recipes': recipe_config.to_dict(),
+            'game_data': game_data.fingerprint(),
+            'backend': backend,
+            'version': RESULT_CACHE_VERSION
+        }, sort_keys=True).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def disk_path(self, key):
+        return os.path.join(self.disk_dir, key + '.json')
+
+    def get(self, key):
+        """Returns (hit, result), result may be None for infeasible problems"""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return True, self.memory[key]
+        if self.disk_dir is not None:
+            try:
+                with open(self.disk_path(key), 'r') as file:
+                    d = json.load(file)
+            except (FileNotFoundError, ValueError):
+                return False, None
+            result = solve.Result.from_dict(d) if d is not None else None
+            self.put_memory(key, result)
+            return True, result
+        return False, None
+
+    def put_memory(self, key, result):
+        self.memory[key] = result
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    def put(self, key, result):
+        self.put_memory(key, result)
+        if self.disk_dir is not None:
+            path = self.disk_path(key)
+            with open(path + '.tmp', 'w') as file:
+                json.dump(result.to_dict() if result is not None else None, file)
+            os.replace(path + '.tmp', path)
+
+    def optimize(self, problem, game_data, recipe_config, backend=solve.DEFAULT_BACKEND):
+        stats = solve.SolveStats()
+        key = self.key(problem, game_data, recipe_config, backend)
+        hit, result = self.get(key)
+        if not hit:
+            result = solve.optimize(problem, game_data, recipe_config, backend)
+            self.put(key, result)
+        elif result is not None:
+            # Report the lookup, not the timings of the solve that was cached
+            stats.lap('cache')
+            stats.status = 'Cached'
+            if result.stats is not None:
+                stats.set_size(result.stats.variables, result.stats.constraints,
+                               result.stats.nonzeros)
+            result.stats = stats
+        return result
@@ -1,3 +1,31 @@
+import os
+
+import yaml
+from appdirs import user_config_dir
+
+
+def config_dir():
+    return user_config_dir('satisfactory-solver', 'robot_rover')
+
+
+def settings_path():
+    return os.path.join(config_dir(), 'settings.yaml')
+
+
+def load_settings():
+    try:
+        with open(settings_path(), 'r') as file:
+            return yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        return {}
+
+
+def save_settings(settings):
+    os.makedirs(config_dir(), exist_ok=True)
+    with open(settings_path(), 'w') as file:
+        yaml.dump(settings, file)
+
+
 class AlternateRecipeConfiguration:
     def __init__(self, enabled_recipe_dict):
         self.enabled_recipes = enabled_recipe_dict
@@ -5,6 +33,11 @@ class AlternateRecipeConfiguration:
     def use_recipe(self, recipe):
         return self.enabled_recipes[recipe]
 
+    def enabled_ids(self):
+        return frozenset(
+            recipe_id for recipe_id, enabled in self.enabled_recipes.items() if enabled
+        )
+
     def to_dict(self):
         return self.enabled_recipes
 
@@ -1,14 +1,108 @@
 from genericpath import exists
+import hashlib
 import json
 import yaml
+import os
 from os import sep, path
 import re
-import itertools
+import pickle
+from sys import intern
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 from solver.resources import ItemRate
 from .util import to_from_dict
 
 DOC_JSON_PATH = './Docs.json'
+PARSE_CACHE_PATH = './docs_cache.pickle'
+# Bump whenever GameData or the classes it holds change shape
+GAME_DATA_SCHEMA = 3
+
+ITEM_CLASSES = (
+    "Class'/Script/FactoryGame.FGItemDescriptor'",
+    "Class'/Script/FactoryGame.FGResourceDescriptor'",
+    "Class'/Script/FactoryGame.FGEquipmentDescriptor'",
+    "Class'/Script/FactoryGame.FGConsumableDescriptor'",
+    "Class'/Script/FactoryGame.FGItemDescAmmoTypeInstantHit'",
+)
+MACHINE_CLASS = "Class'/Script/FactoryGame.FGBuildableManufacturer'"
+RECIPE_CLASS = "Class'/Script/FactoryGame.FGRecipe'"
+SCHEMATIC_CLASS = "Class'/Script/FactoryGame.FGSchematic'"
+USED_CLASSES = ITEM_CLASSES + (MACHINE_CLASS, RECIPE_CLASS, SCHEMATIC_CLASS)
+
+
+# Punctuation, or an atom (quoted spans may hold punctuation) optionally followed by '='
+UE_TOKEN_PAT = re.compile(r"""([(),])|((?:[^(),="']+|"[^"]*"|'[^']*')+)(=?)""")
+
+
+def parse_ue_text(text):
+    """Parse Unreal's exported struct/array text in a single pass.
+
+    Parenthesized groups of Key=Value pairs become dicts, other groups become
+    lists and everything else is left as a string, so
+    ((ItemClass=A,Amount=3),(ItemClass=B,Amount=1)) reads as
+    [{'ItemClass': 'A', 'Amount': '3'}, {'ItemClass': 'B', 'Amount': '1'}].
+    """
+    # Each stack frame is the (key, value) elements of an enclosing group
+    stack = []
+    elements = []
+    key = None
+    value = None
+    for punct, atom, is_key in UE_TOKEN_PAT.findall(text):
+        if atom:
+            if is_key:
+                key = atom
+            else:
+                value = atom
+        elif punct == '(':
+            stack.append((elements, key))
+            elements = []
+            key = None
+        else:
+            if value is not None or key is not None:
+                elements.append((key, value))
+            key = None
+            value = None
+            if punct == ')':
+                assert stack, f"Unbalanced Parenthesis: '{text}'"
+                if elements and elements[0][0] is not None:
+                    value = dict(elements)
+                else:
+                    value = [element for _, element in elements]
+                elements, key = stack.pop()
+    assert not stack, f"Unbalanced Parenthesis: '{text}'"
+    return value
+
+
+# An (ItemClass=...,Amount=n) entry with the '(' or ',' before it, capturing
+# the class name as ue_class_name would
+UE_AMOUNT_PAT = re.compile(r"""[(,]\(ItemClass=(?:[^(),.]*\.)*["']*([^.(),"']+)["']*,Amount=(\d+)\)""")
+
+
+def scan_ue_amounts(text):
+    """[(class name, amount)] of a plain ((ItemClass=...,Amount=n),...) list.
+
+    Reads the list in one regex pass, and returns None for anything else,
+    which is left to parse_ue_text.
+    """
+    amounts = []
+    end = 0
+    for match in UE_AMOUNT_PAT.finditer(text):
+        if match.start() != end:
+            return None
+        amounts.append(match.groups())
+        end = match.end()
+    if not amounts or text[0] != '(' or text[end:] != ')':
+        return None
+    return amounts
+
+
+def ue_class_name(object_path):
+    """BlueprintGeneratedClass'"/Game/Path/Desc_X.Desc_X_C"' -> Desc_X_C"""
+    return object_path.rsplit('.', 1)[-1].strip('"\'')
 
 
 class GameData:
@@ -16,6 +110,28 @@ class GameData:
         self.items = items
         self.recipes = recipes
         self.machines = machines
+        self._fingerprint = None
+
+        # Recipes that produce / consume each item, and the recipes whose
+        # every input and output is a known item
+        self.producers = {}
+        self.consumers = {}
+        self.valid_recipes = {}
+        for recipe in recipes.values():
+            for item_id in recipe.inputs:
+                self.consumers.setdefault(item_id, []).append(recipe)
+            for item_id in recipe.outputs:
+                self.producers.setdefault(item_id, []).append(recipe)
+            if all(resource in items for resource in recipe.inputs) \
+                    and all(resource in items for resource in recipe.outputs):
+                self.valid_recipes[recipe.id] = recipe
+
+    def fingerprint(self):
+        """Stable hash of the game data, used to key cached solve results"""
+        if self._fingerprint is None:
+            encoded = json.dumps(self.to_dict(), sort_keys=True).encode()
+            self._fingerprint = hashlib.sha256(encoded).hexdigest()
+        return self._fingerprint
 
     def to_dict(self):
         return {
@@ -39,9 +155,11 @@ class GameData:
 
 @to_from_dict(['display', 'id', 'description', 'form', 'icon', 'solid'])
 class Item:
+    __slots__ = ('display', 'id', 'description', 'form', 'icon', 'solid')
+
     def __init__(self, display, id, description, form, icon, solid):
         self.display = display
-        self.id = id
+        self.id = intern(id)
         self.description = description
         self.form = form
         self.icon = icon
@@ -79,34 +197,45 @@ class Item:
 
 @to_from_dict(["display", "id", "inputs", "outputs", "machine", "duration", 'unlock'])
 class Recipe:
-    PAR_PAT = re.compile(r"\((.*)\)")
-    AMT_PAT = re.compile(r"\(.*?\.(.+?)\"',Amount=(\d+)\)")
+    __slots__ = ('display', 'id', 'inputs', 'outputs', 'machine', 'duration', 'unlock',
+                 '_input_rates', '_output_rates', '_rates')
 
     def __init__(self, display, id, inputs, outputs, machine, duration, unlock):
         self.display = display
-        self.id = id
-        self.inputs = inputs
-        self.outputs = outputs
-        self.machine = machine
+        self.id = intern(id)
+        self.inputs = {intern(item_id): amount for item_id, amount in inputs.items()}
+        self.outputs = {intern(item_id): amount for item_id, amount in outputs.items()}
+        self.machine = intern(machine) if machine is not None else None
         self.duration = duration
         self.unlock = unlock
+        self._rates = None
 
-    def input_rates(self):
-        return [
+    def compute_rates(self):
+        """Per minute rates, built once since recipes don't change after parsing"""
+        self._input_rates = tuple(
             ItemRate(resource_id, amount / self.duration) for resource_id, amount in self.inputs.items()
-        ]
+        )
+        self._output_rates = tuple(
+            ItemRate(resource_id, amount / self.duration) for resource_id, amount in self.outputs.items()
+        )
+        self._rates = tuple(
+            ItemRate(ir.resource, -ir.rate) for ir in self._input_rates
+        ) + self._output_rates
+
+    def input_rates(self):
+        if self._rates is None:
+            self.compute_rates()
+        return self._input_rates
 
     def output_rates(self):
-        return [
-            ItemRate(resource_id, amount / self.duration) for resource_id, amount in self.outputs.items()
-        ]
+        if self._rates is None:
+            self.compute_rates()
+        return self._output_rates
 
     def get_rates(self):
-        return [
-            ItemRate(resource_id, -amount / self.duration) for resource_id, amount in self.inputs.items()
-        ] + [
-            ItemRate(resource_id, amount / self.duration) for resource_id, amount in self.outputs.items()
-        ]
+        if self._rates is None:
+            self.compute_rates()
+        return self._rates
 
     @classmethod
     def from_node(cls, node, items, machine_set):
@@ -123,25 +252,29 @@ class Recipe:
 
     @staticmethod
     def parse_item_amount(str, items):
+        # Every recipe's list is plain, so the general tokenizer is rarely needed
+        amounts = scan_ue_amounts(str)
+        if amounts is None:
+            parsed = parse_ue_text(str)
+            assert isinstance(parsed, list), f"Unrecognized Amount String: '{str}'"
+            amounts = []
+            for amount in parsed:
+                assert isinstance(amount, dict) and 'ItemClass' in amount and 'Amount' in amount, \
+                    f"Unrecognized Amount String: '{str}'"
+                amounts.append((ue_class_name(amount['ItemClass']), amount['Amount']))
         amt_dict = {}
-        search_start = 0
-        pm = Recipe.PAR_PAT.fullmatch(str)
-        assert pm, f"Unrecognized Parenthesis: '{str}'"
-        par_str = pm[1]
-        while search_start < len(par_str):
-            m = Recipe.AMT_PAT.search(par_str, search_start)
-            assert m, f"Unrecognized Amount String: '{par_str}'"
-            amt_dict[m[1]] = int(m[2]) if m[1] not in items or items[m[1]].solid else int(m[2]) / 1000
-            search_start = m.end()
+        for item_id, count in amounts:
+            count = int(count)
+            amt_dict[item_id] = count if item_id not in items or items[item_id].solid else count / 1000
         return amt_dict
 
     @staticmethod
     def parse_machines(str):
         if not str:
             return None
-        m = Recipe.PAR_PAT.fullmatch(str)
-        assert m, f"Unrecognized Machine String: '{str}'"
-        return [machine.split('.')[-1] for machine in m[1].split(',')]
+        machines = parse_ue_text(str)
+        assert isinstance(machines, list), f"Unrecognized Machine String: '{str}'"
+        return [ue_class_name(machine) for machine in machines]
 
     def __str__(self):
         return self.display
@@ -152,9 +285,11 @@ class Recipe:
 
 @to_from_dict(['display', 'id', 'description', 'power', 'icon'])
 class Machine:
+    __slots__ = ('display', 'id', 'description', 'power', 'icon')
+
     def __init__(self, display, id, description, power, icon):
         self.display = display
-        self.id = id
+        self.id = intern(id)
         self.description = description
         self.power = power
         self.icon = icon
@@ -170,10 +305,10 @@ class Machine:
         return cls(display, id, description, power, icon)
 
     def __repr__(self):
-        return self.ident
+        return self.id
 
     def __str__(self):
-        return self.name
+        return self.display
 
 
 def unlock_priority(unlock):
@@ -194,7 +329,6 @@ def unlock_priority(unlock):
 
 
 def parse_unlock(node):
-    POST_SPLIT_PAT = re.compile(r'\.(.+)\"')
     id = node['ClassName']
     if id == "Schematic_StartingRecipes_C":
         kind = 'EST_Starting'
@@ -225,107 +359,353 @@ def parse_unlock(node):
     recipe_ids = []
     for unlock_node in node['mUnlocks']:
         if unlock_node['Class'] == 'BP_UnlockRecipe_C':
-            remove_paren = Recipe.PAR_PAT.match(unlock_node['mRecipes'])
-            assert remove_paren, "Failed to match unlock recipes"
-            recipe_paths = remove_paren.group(1).split(',')
-            recipe_ids.extend(POST_SPLIT_PAT.search(path).group(1)
-                              for path in recipe_paths)
+            recipe_paths = parse_ue_text(unlock_node['mRecipes'])
+            assert isinstance(recipe_paths, list), "Failed to match unlock recipes"
+            recipe_ids.extend(ue_class_name(path) for path in recipe_paths)
 
     return (unlock, recipe_ids)
 
 
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def export_docs(game_data, generate_path='./'):
     with open(generate_path + "game_data.yaml", "w") as data_file:
         print("Generating game_data.yaml")
         yaml.dump(game_data.to_dict(), data_file)
 
 
-def scrape_docs(doc_path=DOC_JSON_PATH):
-    with open(doc_path, "r", encoding="utf16") as file:
-        docs = json.load(file)
-        docs = {item["NativeClass"]: item["Classes"] for item in docs}
-
-        items = itertools.chain((
-            Item.from_node(node)
-            for node in docs["Class'/Script/FactoryGame.FGItemDescriptor'"]
-        ), (
-            Item.from_node(node)
-            for node in docs["Class'/Script/FactoryGame.FGResourceDescriptor'"]
-        ), (
-            Item.from_node(node)
-            for node in docs["Class'/Script/FactoryGame.FGEquipmentDescriptor'"]
-        ), (
-            Item.from_node(node)
-            for node in docs["Class'/Script/FactoryGame.FGConsumableDescriptor'"]
-        ), (
-            Item.from_node(node)
-            for node in docs["Class'/Script/FactoryGame.FGItemDescAmmoTypeInstantHit'"]
-        ))
-        items = {
-            item.id: item for item in items
-        }
+def file_stamp(file_path, known=None):
+    """(mtime, size, SHA-256) of a file, only hashed if mtime or size differ from known"""
+    stat = os.stat(file_path)
+    if known is not None and tuple(known[:2]) == (stat.st_mtime_ns, stat.st_size):
+        return known
+    return (stat.st_mtime_ns, stat.st_size, file_hash(file_path))
 
-        machines = (
-            Machine.from_node(node) for node in docs["Class'/Script/FactoryGame.FGBuildableManufacturer'"]
-        )
-        machines = {
-            machine.id: machine for machine in machines
-        }
 
-        recipes = (
-            Recipe.from_node(node, items, machines) for node in docs["Class'/Script/FactoryGame.FGRecipe'"]
-        )
-        recipes = {
-            recipe.id: recipe for recipe in recipes
-        }
-        filtered_recipes = {
-            recipe_id: recipe for recipe_id, recipe in recipes.items()
-            if all(resource in items for resource in recipe.inputs)
-            if all(resource in items for resource in recipe.outputs)
-            if recipe.machine is not None
-        }
+def export_binary(game_data, source, stamp, generate_path='./'):
+    """Cache game_data with the stamp of its source file, 'docs' or 'yaml'"""
+    temp_path = generate_path + "game_data.pickle.tmp"
+    with open(temp_path, "wb") as data_file:
+        pickle.dump({
+            'schema': GAME_DATA_SCHEMA,
+            'source': source,
+            'stamp': stamp,
+            'game_data': game_data
+        }, data_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, generate_path + "game_data.pickle")
 
-        for node in docs["Class'/Script/FactoryGame.FGSchematic'"]:
-            unlock, recipe_ids = parse_unlock(node)
-            for recipe_id in recipe_ids:
-                recipe = filtered_recipes.get(recipe_id)
-                if recipe is not None:
-                    if recipe.unlock is not None:
-                        if recipe.unlock[0] == unlock[0]:
-                            continue
-                        current_p = unlock_priority(recipe.unlock)
-                        new_p = unlock_priority(unlock)
-                        assert current_p != new_p, f"Equal Priority, {current_p} == {new_p} for {recipe.display}"
-                        if current_p > new_p:
-                            continue
-                    recipe.unlock = list(unlock)
 
-        return GameData(items, filtered_recipes, machines)
+def load_binary(yaml_path="./", doc_path=DOC_JSON_PATH):
+    """Returns the cached GameData, or None if it is missing or stale.
+
+    The cache is stale once the file it was built from has changed. That file
+    is only hashed again when its mtime or size moved since it was stamped.
+    """
+    try:
+        with open(yaml_path + "game_data.pickle", 'rb') as data_stream:
+            cached = pickle.load(data_stream)
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if not isinstance(cached, dict) or cached.get('schema') != GAME_DATA_SCHEMA:
+        return None
+    sources = {'docs': doc_path, 'yaml': yaml_path + "game_data.yaml"}
+    source_path = sources.get(cached.get('source'))
+    if source_path is None:
+        return None
+    if not path.exists(source_path):
+        return cached['game_data']
+    stamp = file_stamp(source_path, cached['stamp'])
+    if stamp[2] != cached['stamp'][2]:
+        return None
+    if stamp != cached['stamp']:
+        # Touched but unchanged, restamp so the next start skips the hash
+        export_binary(cached['game_data'], cached['source'], stamp, yaml_path)
+    return cached['game_data']
+
+
+def load_yaml(yaml_path):
+    with open(yaml_path, 'r') as data_stream:
+        data = yaml.safe_load(data_stream)
+    recipes = {
+        recipe["id"]: Recipe.from_dict(recipe) for recipe in data['recipes'].values()
+    }
+    items = {
+        item["id"]: Item.from_dict(item) for item in data['items'].values()
+    }
+    machines = {
+        machine['id']: Machine.from_dict(machine) for machine in data['machines'].values()
+    }
+    return GameData(items, recipes, machines)
+
+
+def resolve_unlock(recipe, unlocks):
+    """Pick the highest priority of the unlocks that grant a recipe, in schematic order"""
+    resolved = None
+    for unlock in unlocks:
+        if resolved is not None:
+            if resolved[0] == unlock[0]:
+                continue
+            current_p = unlock_priority(resolved)
+            new_p = unlock_priority(unlock)
+            assert current_p != new_p, f"Equal Priority, {current_p} == {new_p} for {recipe.display}"
+            if current_p > new_p:
+                continue
+        resolved = list(unlock)
+    return resolved
+
+
+def section_hash(classes):
+    return hashlib.sha256(json.dumps(classes, sort_keys=True).encode()).hexdigest()
+
+
+def diff_objects(old, new):
+    """Returns the ids (added, removed, modified) between two lists of parsed objects"""
+    def comparable(obj):
+        d = obj.to_dict()
+        # Recipes are compared before their unlock is resolved
+        d.pop('unlock', None)
+        return d
+    old = {obj.id: comparable(obj) for obj in old}
+    new = {obj.id: comparable(obj) for obj in new}
+    added = [id for id in new if id not in old]
+    removed = [id for id in old if id not in new]
+    modified = [id for id in new if id in old and new[id] != old[id]]
+    return added, removed, modified
+
+
+def new_parse_cache():
+    return {'schema': GAME_DATA_SCHEMA, 'sections': {}, 'unlocks': {}}
+
+
+def load_parse_cache(cache_path):
+    try:
+        with open(cache_path, 'rb') as cache_stream:
+            cache = pickle.load(cache_stream)
+        if cache.get('schema') == GAME_DATA_SCHEMA:
+            return cache
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+    return new_parse_cache()
+
+
+def save_parse_cache(cache, cache_path):
+    with open(cache_path + '.tmp', 'wb') as cache_stream:
+        pickle.dump(cache, cache_stream, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(cache_path + '.tmp', cache_path)
+
+
+class Utf8Reader:
+    """Re-encodes a decoded text stream as UTF-8 bytes for ijson"""
+
+    def __init__(self, text_file):
+        self.text_file = text_file
+
+    def read(self, size=-1):
+        return self.text_file.read(size).encode('utf-8')
+
+
+def iter_sections_ijson(file, wanted):
+    native_class = None
+    builder = None
+    for prefix, event, value in ijson.parse(Utf8Reader(file), use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == 'item.Classes' and event == 'end_array':
+                yield native_class, builder.value
+                builder = None
+        elif prefix == 'item.NativeClass':
+            native_class = value
+        elif prefix == 'item.Classes' and event == 'start_array' and native_class in wanted:
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+
+
+def iter_sections_chunked(file, wanted, chunk_size=1 << 20):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n[,':
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            if pos == len(buffer):
+                raise ValueError()
+            section, end = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if eof:
+                if buffer[pos:].strip():
+                    raise
+                return
+            # Grow reads with the buffer so long sections don't decode quadratically
+            chunk = file.read(max(chunk_size, len(buffer) - pos))
+            eof = chunk == ''
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        if section['NativeClass'] in wanted:
+            yield section['NativeClass'], section['Classes']
+        pos = end
+
+
+def iter_sections(doc_path, wanted=USED_CLASSES, streaming=True):
+    """Yields (NativeClass, Classes) for the wanted sections of Docs.json.
+
+    When streaming, the document is decoded incrementally and only the wanted
+    sections are ever built, using ijson when it is installed.
+    """
+    with open(doc_path, "r", encoding="utf16") as file:
+        if not streaming:
+            yield from (
+                (section["NativeClass"], section["Classes"]) for section in json.load(file)
+                if section["NativeClass"] in wanted
+            )
+        elif ijson is not None:
+            yield from iter_sections_ijson(file, wanted)
+        else:
+            yield from iter_sections_chunked(file, wanted)
+
+
+def scrape_docs(doc_path=DOC_JSON_PATH, cache_path=None, changes=None, streaming=True):
+    """Parse Docs.json into GameData.
+
+    With a cache_path, every NativeClass section is hashed and sections whose
+    hash is unchanged since the last parse are reused instead of rebuilt.
+    Human readable change notes are appended to changes if it is given.
+    """
+    cache = load_parse_cache(cache_path) if cache_path is not None \
+        else new_parse_cache()
+    sections = cache['sections']
+    if changes is None:
+        changes = []
+
+    docs = dict(iter_sections(doc_path, USED_CLASSES, streaming))
+
+    def parse_section(native_class, parse, depends=''):
+        """The section's objects, and the ids added or modified since the
+        cached parse, None when there is nothing to compare against"""
+        digest = section_hash(docs[native_class]) + depends
+        cached = sections.get(native_class)
+        if cached is not None and cached[0] == digest:
+            return cached[1], set()
+        parsed = parse(docs[native_class])
+        rebuilt = None
+        if cached is None:
+            changes.append(f"{native_class}: parsed {len(parsed)} classes")
+        elif native_class != SCHEMATIC_CLASS:
+            added, removed, modified = diff_objects(cached[1], parsed)
+            changes.append(f"{native_class}: {len(added)} added, {len(removed)} removed, "
+                           f"{len(modified)} modified")
+            changes.extend(f"  + {id}" for id in added)
+            changes.extend(f"  - {id}" for id in removed)
+            changes.extend(f"  ~ {id}" for id in modified)
+            rebuilt = set(added) | set(modified)
+        sections[native_class] = (digest, parsed)
+        return parsed, rebuilt
+
+    item_sections = [
+        parse_section(native_class, lambda classes: [Item.from_node(node) for node in classes])
+        for native_class in ITEM_CLASSES
+    ]
+    items = {
+        item.id: item for section, _ in item_sections for item in section
+    }
+
+    machines, _ = parse_section(
+        MACHINE_CLASS, lambda classes: [Machine.from_node(node) for node in classes])
+    machines = {
+        machine.id: machine for machine in machines
+    }
+
+    # Recipes look up item forms and machines, so rebuild them whenever those change
+    depends = "".join(sections[native_class][0] for native_class in ITEM_CLASSES + (MACHINE_CLASS,))
+    old_recipes = {recipe.id: recipe for recipe in sections[RECIPE_CLASS][1]} \
+        if RECIPE_CLASS in sections else {}
+    recipes, rebuilt = parse_section(
+        RECIPE_CLASS, lambda classes: [Recipe.from_node(node, items, machines) for node in classes],
+        hashlib.sha256(depends.encode()).hexdigest())
+    filtered_recipes = {
+        recipe.id: recipe for recipe in recipes
+        if all(resource in items for resource in recipe.inputs)
+        if all(resource in items for resource in recipe.outputs)
+        if recipe.machine is not None
+    }
+
+    schematics, _ = parse_section(
+        SCHEMATIC_CLASS, lambda classes: [parse_unlock(node) for node in classes])
+    recipe_unlocks = {}
+    for unlock, recipe_ids in schematics:
+        for recipe_id in recipe_ids:
+            recipe_unlocks.setdefault(recipe_id, []).append(unlock)
+
+    # Only re-resolve recipes that were added, modified or are granted by
+    # different schematics. The rest keep what was resolved for them last time.
+    previous_unlocks = cache['unlocks']
+    resolved = 0
+    for recipe_id, recipe in filtered_recipes.items():
+        unlocks = recipe_unlocks.get(recipe_id, [])
+        old = old_recipes.get(recipe_id)
+        if old is not None and old is not recipe:
+            recipe.unlock = old.unlock
+        if rebuilt is None or recipe_id in rebuilt or previous_unlocks.get(recipe_id) != unlocks:
+            unlock = resolve_unlock(recipe, unlocks)
+            if old is not None and unlock != recipe.unlock:
+                changes.append(f"  ~ {recipe_id} unlock {recipe.unlock} -> {unlock}")
+            recipe.unlock = unlock
+            resolved += 1
+    # Only recipes that were resolved, so one that starts passing the filter is
+    cache['unlocks'] = {
+        recipe_id: recipe_unlocks.get(recipe_id, []) for recipe_id in filtered_recipes
+    }
+    if resolved > 0:
+        changes.append(f"Resolved unlocks for {resolved} recipes")
+
+    if cache_path is not None:
+        save_parse_cache(cache, cache_path)
+
+    return GameData(items, filtered_recipes, machines)
 
 
 def get_docs(yaml_path="./", doc_path=DOC_JSON_PATH):
-    try:
-        with open(yaml_path + "game_data.yaml", 'r') as data_stream:
-            data = yaml.safe_load(data_stream)
-        recipes = {
-            recipe["id"]: Recipe.from_dict(recipe) for recipe in data['recipes'].values()
-        }
-        items = {
-            item["id"]: Item.from_dict(item) for item in data['items'].values()
-        }
-        machines = {
-            machine['id']: Machine.from_dict(machine) for machine in data['machines'].values()
-        }
-        return GameData(items, recipes, machines)
+    yaml_file = yaml_path + "game_data.yaml"
+    binary_path = yaml_path + "game_data.pickle"
+    # A hand edited or newer game_data.yaml takes precedence over the cache
+    yaml_newer = path.exists(yaml_file) and path.exists(binary_path) \
+        and path.getmtime(yaml_file) > path.getmtime(binary_path)
+    if not yaml_newer:
+        game_data = load_binary(yaml_path, doc_path)
+        if game_data is not None:
+            return game_data
 
+    try:
+        game_data = load_yaml(yaml_file)
     except FileNotFoundError:
         return scrape_docs(doc_path)
 
+    # Stamped with the yaml it was read from, which may predate Docs.json.
+    # 'python -m solver parse' regenerates both from Docs.json.
+    export_binary(game_data, 'yaml', file_stamp(yaml_file), yaml_path)
+    return game_data
+
 
 def main(path=DOC_JSON_PATH):
     from sys import argv
-    game_data = scrape_docs(path)
+    changes = []
+    game_data = scrape_docs(path, PARSE_CACHE_PATH, changes)
+    if changes:
+        print("\n".join(changes))
+    else:
+        print("No changes since the last parse")
     export_docs(game_data)
+    export_binary(game_data, 'docs', file_stamp(path))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+import json
+import os
+
+import PySide6.QtCore as qtc
+import PySide6.QtGui as qtg
+
+ICON_DIR = 'icons'
+# Heights the GUI draws icons at, and so the heights atlases are built for
+ATLAS_HEIGHTS = (50, 100)
+ATLAS_WIDTH = 2048
+ICON_CACHE_KB = 32 * 1024
+
+_atlases = {}
+
+
+def atlas_paths(height):
+    return (os.path.join(ICON_DIR, f'atlas_{height}.png'),
+            os.path.join(ICON_DIR, f'atlas_{height}.json'))
+
+
+def load_atlas(height):
+    """(pixmap, index) of the prebuilt atlas for height, None if there isn't one"""
+    if height not in _atlases:
+        image_path, index_path = atlas_paths(height)
+        atlas = None
+        try:
+            with open(index_path, 'r') as file:
+                index = json.load(file)
+            atlas = (qtg.QPixmap(image_path), index)
+        except (FileNotFoundError, ValueError):
+            pass
+        _atlases[height] = atlas
+    return _atlases[height]
+
+
+def atlas_pixmap(path, height):
+    atlas = load_atlas(height)
+    if atlas is None:
+        return None
+    pixmap, index = atlas
+    entry = index.get(path)
+    if entry is None or pixmap.isNull():
+        return None
+    x, y, width, entry_height, mtime = entry
+    # An icon replaced since the atlas was built is decoded afresh
+    try:
+        if os.path.getmtime(path) != mtime:
+            return None
+    except OSError:
+        return None
+    return pixmap.copy(x, y, width, entry_height)
+
+
+def pixmap(path, height):
+    """The icon at path scaled to height, shared by every widget.
+
+    Pixmaps are kept in QPixmapCache, so each icon is decoded and scaled at
+    most once while it stays cached, and cut from the atlas when one exists.
+    """
+    key = f'{path}@{height}'
+    cached = qtg.QPixmapCache.find(key)
+    if cached is not None:
+        return cached
+    scaled = atlas_pixmap(path, height)
+    if scaled is None:
+        scaled = qtg.QPixmap(path).scaledToHeight(height, qtc.Qt.SmoothTransformation)
+    qtg.QPixmapCache.insert(key, scaled)
+    return scaled
+
+
+def build_atlas(paths, height):
+    """Pack every icon in paths, scaled to height, into one image and index"""
+    placed = {}
+    images = []
+    x = y = 0
+    for path in sorted(set(paths)):
+        image = qtg.QImage(path)
+        if image.isNull():
+            print(f"Skipping unreadable icon {path}")
+            continue
+        image = image.scaledToHeight(height, qtc.Qt.SmoothTransformation)
+        if x + image.width() > ATLAS_WIDTH:
+            x = 0
+            y += height
+        placed[path] = [x, y, image.width(), image.height(), os.path.getmtime(path)]
+        images.append((x, y, image))
+        x += image.width()
+
+    atlas = qtg.QImage(ATLAS_WIDTH, y + height, qtg.QImage.Format_ARGB32_Premultiplied)
+    atlas.fill(qtc.Qt.transparent)
+    painter = qtg.QPainter(atlas)
+    for x, y, image in images:
+        painter.drawImage(x, y, image)
+    painter.end()
+
+    image_path, index_path = atlas_paths(height)
+    atlas.save(image_path)
+    with open(index_path, 'w') as file:
+        json.dump(placed, file)
+    print(f"Packed {len(placed)} icons into {image_path}")
+
+
+def icon_paths(game_data):
+    from .gui_main import OUTPUT_ICON
+    paths = [item.icon for item in game_data.items.values()]
+    paths.extend(machine.icon for machine in game_data.machines.values())
+    paths.append(OUTPUT_ICON)
+    return [path for path in paths if os.path.exists(path)]
+
+
+def main(args):
+    from . import game_parse
+    paths = icon_paths(game_parse.get_docs())
+    for height in ATLAS_HEIGHTS:
+        build_atlas(paths, height)
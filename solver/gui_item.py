@@ -4,6 +4,7 @@ import PySide6.QtWidgets as qtw
 import PySide6.QtCore as qtc
 import PySide6.QtGui as qtg
 
+from . import gui_icons
 from .util import clearLayout
 
 
@@ -124,8 +125,7 @@ class RecipeListWindow(qtw.QWidget):
         item_icon.setFlat(True)
         item_icon.setFixedSize(50, 50)
         item_icon.clicked.connect(lambda: self.select_item(item, True))
-        pixmap = qtg.QPixmap(item.icon).scaledToHeight(
-            50, qtc.Qt.SmoothTransformation)
+        pixmap = gui_icons.pixmap(item.icon, 50)
         icon = qtg.QIcon(pixmap)
         item_icon.setIcon(icon)
         item_icon.setIconSize(pixmap.rect().size())
@@ -151,17 +151,10 @@ class RecipeListWindow(qtw.QWidget):
         self.clear_recipe()
         self.setWindowTitle(f'Recipe Viewer - {item.display}')
 
-        input_recipes = [
-            recipe for recipe in self.game_data.recipes.values()
-            if any(input == item.id for input in recipe.inputs)
-        ]
-        self.input_model.set_recipes(input_recipes)
-
-        output_recipes = [
-            recipe for recipe in self.game_data.recipes.values()
-            if any(output == item.id for output in recipe.outputs)
-        ]
-        self.output_model.set_recipes(output_recipes)
+        self.input_model.set_recipes(
+            list(self.game_data.consumers.get(item.id, [])))
+        self.output_model.set_recipes(
+            list(self.game_data.producers.get(item.id, [])))
 
     def select_recipe(self, index, is_input):
         self.clear_recipe()
@@ -173,8 +166,7 @@ class RecipeListWindow(qtw.QWidget):
         per_min = round(1/recipe.duration, 3)
         self.machine_name.setText(
             f'{machine.display}\n{per_min} / min\n{machine.power} MW')
-        pixmap = qtg.QPixmap(machine.icon).scaledToHeight(
-            100, qtc.Qt.SmoothTransformation)
+        pixmap = gui_icons.pixmap(machine.icon, 100)
         self.machine_icon.setPixmap(pixmap)
 
         for item_id, rate in recipe.inputs.items():
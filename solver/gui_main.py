@@ -1,39 +1,42 @@
 import math
+import traceback
 
 import PySide6.QtWidgets as qtw
 import PySide6.QtCore as qtc
 import PySide6.QtGui as qtg
 import PySide6.QtSvg as qtsvg
 import PySide6.QtSvgWidgets as qtsvgw
-from fuzzywuzzy import process
 import sys
 import yaml
 
 
-from . import game_parse, solve, visualize
+from . import cache, config, game_parse, gui_icons, search, solve, visualize
 from .resources import ItemRate
 from .gui_recipes import AlternateRecipeWindow
 from .gui_item import RecipeListWindow
 
 OUTPUT_ICON = 'icons/Milestone/Recipe_Icon_Equipment_Dark.png'
+LIVE_SOLVE_DELAY_MS = 150
 
 
 class FuzzyQCompleter(qtw.QCompleter):
-    def __init__(self, parent, items):
+    def __init__(self, parent, index):
         super().__init__(parent=parent)
         self.term = ""
-        self.items = items
+        self.index = index
+        self.lst = []
+        # One model for the completer's lifetime, only its rows change
+        self.string_model = qtc.QStringListModel()
+        self.setModel(self.string_model)
 
     def setCompletionPrefix(self, term):
         self.term = term
         self.completion()
 
     def completion(self):
-        l = process.extractBests(self.term, self.items.keys(), limit=20)
-        self.lst = [self.items[display] for display, value in l]
-        model = qtc.QStringListModel()
-        model.setStringList(t[0] for t in l)
-        self.setModel(model)
+        matches = self.index.search(self.term, limit=20)
+        self.lst = [value for display, value in matches]
+        self.string_model.setStringList([display for display, value in matches])
 
     def pathFromIndex(self, index):
         return ""  # self.lst[index.row()]
@@ -44,7 +47,7 @@ class FuzzyQCompleter(qtw.QCompleter):
 
 
 class ItemSearchWidget(qtw.QLineEdit):
-    def __init__(self, default_text, items, shortcut=None):
+    def __init__(self, default_text, index, shortcut=None):
         super().__init__()
         self.callback = None
         self.setPlaceholderText(default_text)
@@ -55,7 +58,7 @@ class ItemSearchWidget(qtw.QLineEdit):
                 lambda: self.setFocus(qtc.Qt.ShortcutFocusReason))
 
         input_search_comp = FuzzyQCompleter(
-            self, items)
+            self, index)
         input_search_comp.setCompletionMode(
             qtw.QCompleter.CompletionMode.PopupCompletion)
         input_search_comp.setModelSorting(
@@ -68,8 +71,8 @@ class ItemSearchWidget(qtw.QLineEdit):
         self.setCompleter(input_search_comp)
 
     def select_item(self, idx):
-        if not self.text():
-            return  # Avoid double add
+        if not self.text() or idx >= len(self.completer().lst):
+            return  # Avoid double add, or nothing matched
         item = self.completer().lst[idx]
 
         self.callback(item)
@@ -134,8 +137,7 @@ class SchematicInputWidget(qtw.QWidget):
             self.group_box.setTitle('')
 
     def setIcon(self, icon_path):
-        self.pixmap = qtg.QPixmap(icon_path).scaledToHeight(
-            50, qtc.Qt.SmoothTransformation)
+        self.pixmap = gui_icons.pixmap(icon_path, 50)
         self.icon = qtg.QIcon(self.pixmap)
         self.icon_label.setIcon(self.icon)
         self.icon_label.setIconSize(self.pixmap.rect().size())
@@ -195,17 +197,82 @@ class ZoomingGraphicsView(qtw.QGraphicsView):
             super().wheelEvent(event)
 
 
+class SolveSignals(qtc.QObject):
+    # job id, solution (or None), rendered svg bytes (or None)
+    finished = qtc.Signal(int, object, object)
+    failed = qtc.Signal(int, str)
+
+
+class SolveJob(qtc.QRunnable):
+    """Solves a problem and lays out its diagram off the GUI thread"""
+
+    def __init__(self, job_id, signals, problem, game_data, recipe_config, result_cache, distribute,
+                 backend=solve.DEFAULT_BACKEND):
+        super().__init__()
+        self.job_id = job_id
+        self.signals = signals
+        self.problem = problem
+        self.game_data = game_data
+        self.recipe_config = recipe_config
+        self.result_cache = result_cache
+        self.distribute = distribute
+        self.backend = backend
+        self.cancelled = False
+
+    def run(self):
+        try:
+            if self.cancelled:
+                return
+            solution = self.result_cache.optimize(
+                self.problem, self.game_data, self.recipe_config, self.backend)
+            if self.cancelled:
+                return
+            svg = None
+            if solution is not None:
+                svg = visualize.visualize(solution, self.game_data, image_format='svg',
+                                          recipe_distribute=self.distribute,
+                                          stats=solution.stats)
+            self.signals.finished.emit(self.job_id, solution, svg)
+        except Exception:
+            self.signals.failed.emit(self.job_id, traceback.format_exc())
+
+
 class SatisfactorySolverMain(qtw.QApplication):
     def __init__(self, args):
         super().__init__(args)
+        qtg.QPixmapCache.setCacheLimit(gui_icons.ICON_CACHE_KB)
         self.game_data = game_parse.get_docs()
-        self.item_lookup = {
-            item.display: item for item in self.game_data.items.values()}
+        self.item_index = search.SearchIndex(search.item_entries(self.game_data))
 
+        self.result_cache = cache.ResultCache(
+            disk_dir=cache.result_cache_dir())
         self.solution = None
         self.current_file = None
+        self.settings = config.load_settings()
+        self.backend = self.settings.get('backend', solve.DEFAULT_BACKEND)
+        if self.backend not in solve.BACKENDS:
+            self.backend = solve.DEFAULT_BACKEND
+        # Targets and ratio mode of an opened multi-target plan, which the
+        # target box can only show the first of
+        self.plan_targets = None
         self.windows = []
 
+        # Jobs run one at a time; a newer Go! cancels whatever is in flight
+        self.solve_pool = qtc.QThreadPool()
+        self.solve_pool.setMaxThreadCount(1)
+        self.solve_signals = SolveSignals()
+        self.solve_signals.finished.connect(self.solve_finished)
+        self.solve_signals.failed.connect(self.solve_failed)
+        self.job_id = 0
+        self.current_job = None
+        self.on_solved = None
+
+        # Batches bursts of edits into one re-solve while live solving
+        self.live_timer = qtc.QTimer()
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(LIVE_SOLVE_DELAY_MS)
+        self.live_timer.timeout.connect(lambda: self.go_fn())
+
         self.w = qtw.QMainWindow()
         self.central_widget = qtw.QWidget()
         self.w.setCentralWidget(self.central_widget)
@@ -219,7 +286,7 @@ class SatisfactorySolverMain(qtw.QApplication):
         self.center_layout.addLayout(self.input_layout)
 
         self.input_search_box = ItemSearchWidget(
-            'Add Input', self.item_lookup, qtg.QShortcut(qtg.QKeySequence(qtc.Qt.CTRL | qtc.Qt.Key_I), self.w))
+            'Add Input', self.item_index, qtg.QShortcut(qtg.QKeySequence(qtc.Qt.CTRL | qtc.Qt.Key_I), self.w))
         self.input_layout.addWidget(self.input_search_box)
 
         self.input_scroll = qtw.QScrollArea()
@@ -239,7 +306,7 @@ class SatisfactorySolverMain(qtw.QApplication):
         self.input_search_box.callback = self.add_input
 
         self.output_search = ItemSearchWidget(
-            'Set Target', self.item_lookup, qtg.QShortcut(qtg.QKeySequence(qtc.Qt.CTRL | qtc.Qt.Key_T), self.w))
+            'Set Target', self.item_index, qtg.QShortcut(qtg.QKeySequence(qtc.Qt.CTRL | qtc.Qt.Key_T), self.w))
         self.input_layout.addWidget(self.output_search)
         self.go_box = qtw.QPushButton("Go!")
         self.output_show_box = SchematicInputWidget(
@@ -247,7 +314,7 @@ class SatisfactorySolverMain(qtw.QApplication):
         self.output_show_box.setIcon(OUTPUT_ICON)
         self.input_layout.addWidget(self.output_show_box)
 
-        self.output_search.callback = self.output_show_box.setItem
+        self.output_search.callback = self.set_target
 
         self.svg_scene = qtw.QGraphicsScene()
         self.svg_view = ZoomingGraphicsView(self.svg_scene)
@@ -258,7 +325,15 @@ class SatisfactorySolverMain(qtw.QApplication):
 
         self.center_layout.addWidget(self.svg_view, 1)
 
-        self.go_box.clicked.connect(self.go_fn)
+        self.solve_progress = qtw.QProgressBar()
+        self.solve_progress.setRange(0, 0)
+        self.solve_progress.setMaximumWidth(150)
+        self.solve_progress.hide()
+        self.w.statusBar().addPermanentWidget(self.solve_progress)
+        self.solve_stats = qtw.QLabel()
+        self.w.statusBar().addPermanentWidget(self.solve_stats)
+
+        self.go_box.clicked.connect(lambda: self.go_fn())
         self.go_box.setShortcut(qtg.QKeySequence(
             qtc.Qt.CTRL | qtc.Qt.Key_G))
 
@@ -331,16 +406,37 @@ class SatisfactorySolverMain(qtw.QApplication):
         self.distAct.setStatusTip(
             'Show a recipe quantity distributed across an integer number of machines')
         self.distAct.setCheckable(True)
-        self.distAct.triggered.connect(self.go_fn)
+        self.distAct.triggered.connect(lambda: self.go_fn())
         self.edit_menu.addAction(self.distAct)
         self.edit_menu_actions.append(self.distAct)
 
+        self.liveAct = qtg.QAction('&Live Solve')
+        self.liveAct.setStatusTip(
+            'Re-solve automatically whenever the inputs or target change')
+        self.liveAct.setCheckable(True)
+        self.liveAct.triggered.connect(self.schedule_live_solve)
+        self.edit_menu.addAction(self.liveAct)
+        self.edit_menu_actions.append(self.liveAct)
+
         excessAct = qtg.QAction('Remove &Excess')
         excessAct.setStatusTip('Remove excess Inputs from Plan')
         excessAct.triggered.connect(self.remove_excess_inputs)
         self.edit_menu.addAction(excessAct)
         self.edit_menu_actions.append(excessAct)
 
+        self.backend_menu = self.edit_menu.addMenu('Solver &Backend')
+        self.backend_group = qtg.QActionGroup(self.w)
+        self.backend_group.setExclusive(True)
+        for backend in solve.BACKENDS:
+            backendAct = qtg.QAction(backend, self.backend_group)
+            backendAct.setStatusTip(f'Solve with the {backend} backend')
+            backendAct.setCheckable(True)
+            backendAct.setChecked(backend == self.backend)
+            backendAct.triggered.connect(
+                lambda checked, backend=backend: self.set_backend(backend))
+            self.backend_menu.addAction(backendAct)
+            self.edit_menu_actions.append(backendAct)
+
     def set_tab_order(self):
         qtw.QWidget.setTabOrder(self.input_search_box,
                                 self.input_scroll_holdee)
@@ -351,6 +447,8 @@ class SatisfactorySolverMain(qtw.QApplication):
     def clearWindow(self):
         self.current_file = None
         self.solution = None
+        self.plan_targets = None
+        self.output_show_box.setToolTip('')
         self.svg_renderer.deleteLater()
         self.svg_renderer = qtsvg.QSvgRenderer()
         self.svg_item.setSharedRenderer(self.svg_renderer)
@@ -370,7 +468,25 @@ class SatisfactorySolverMain(qtw.QApplication):
                 return
         widget = SchematicInputWidget.with_spinbox(
             item, rate, self.open_recipe_window, self.game_data)
+        widget.group_widget.valueChanged.connect(self.schedule_live_solve)
+        widget.group_box.toggled.connect(self.schedule_live_solve)
         self.input_list.insertWidget(self.input_list.count() - 1, widget)
+        self.schedule_live_solve()
+
+    def set_backend(self, backend):
+        self.backend = backend
+        self.settings['backend'] = backend
+        config.save_settings(self.settings)
+
+    def set_target(self, item):
+        self.plan_targets = None
+        self.output_show_box.setToolTip('')
+        self.output_show_box.setItem(item)
+        self.schedule_live_solve()
+
+    def schedule_live_solve(self):
+        if self.liveAct.isChecked() and self.output_show_box.getItem() is not None:
+            self.live_timer.start()
 
     def open_recipe_window(self, item):
         if item is None:
@@ -395,26 +511,83 @@ class SatisfactorySolverMain(qtw.QApplication):
             ItemRate(item_box.getItem().id, item_box.getRate()) for item_box in
             self.iterate_input_widgets()
         ]
+        if self.plan_targets is not None:
+            targets, ratio = self.plan_targets
+            return solve.Problem(targets, inputs, ratio)
         return solve.Problem(target, inputs)
 
-    def go_fn(self):
+    def go_fn(self, on_solved=None):
         problem = self.get_problem()
         if problem is None:
             qtw.QMessageBox.warning(self.w, "Select a Target!",
                                     "Please select a target item before solving.")
             return
-        self.solution = solve.optimize(
-            problem, self.game_data, self.recipe_window.to_recipe_config())
+        self.live_timer.stop()
+        self.solve_pool.clear()
+        if self.current_job is not None:
+            self.current_job.cancelled = True
+        self.job_id += 1
+        self.on_solved = on_solved
+        self.current_job = SolveJob(
+            self.job_id, self.solve_signals, problem, self.game_data,
+            self.recipe_window.to_recipe_config(), self.result_cache,
+            self.distAct.isChecked(), self.backend)
+        self.solve_progress.show()
+        self.w.statusBar().showMessage("Solving...")
+        self.solve_pool.start(self.current_job)
+
+    def solve_finished(self, job_id, solution, svg):
+        if job_id != self.job_id:
+            return
+        self.current_job = None
+        self.solve_progress.hide()
+        self.solution = solution
         print(self.solution)
-        visualize.visualize(self.solution, self.game_data, image_file='.temp.svg',
-                            recipe_distribute=self.distAct.isChecked())
-        self.svg_renderer.load('.temp.svg')
+        self.solve_stats.setText(
+            str(solution.stats) if solution is not None and solution.stats is not None else '')
+        if solution is None:
+            self.w.statusBar().showMessage("No feasible solution")
+            return
+        self.show_shadow_prices(solution)
+        self.svg_renderer.load(qtc.QByteArray(svg))
         self.svg_item.setElementId('')
+        if self.on_solved is not None:
+            on_solved, self.on_solved = self.on_solved, None
+            on_solved()
+
+    def show_shadow_prices(self, solution):
+        target = self.game_data.items[solution.problem.target].display
+        for input_widget in self.iterate_input_widgets():
+            price = solution.shadow_prices.get(input_widget.item.id, 0)
+            input_widget.group_widget.setToolTip(
+                f"+{price:g} {target}/min per extra unit/min")
+        binding = [
+            (solution.shadow_prices.get(ir.resource, 0), ir.resource)
+            for ir in solution.problem.inputs
+            if ir.resource != solution.problem.target
+        ]
+        binding = [(price, item_id) for price, item_id in binding if price > 0]
+        if binding:
+            price, item_id = max(binding)
+            self.w.statusBar().showMessage(
+                f"Most limiting input: {self.game_data.items[item_id].display} "
+                f"(+{price:g} {target}/min per unit)")
+        else:
+            self.w.statusBar().clearMessage()
 
-    def remove_excess_inputs(self):
-        self.go_fn()
-        if self.solution is None:
+    def solve_failed(self, job_id, error):
+        print(error)
+        if job_id != self.job_id:
             return
+        self.current_job = None
+        self.on_solved = None
+        self.solve_progress.hide()
+        self.w.statusBar().showMessage("Solve failed")
+
+    def remove_excess_inputs(self):
+        self.go_fn(on_solved=self.subtract_excess_inputs)
+
+    def subtract_excess_inputs(self):
         for output_ir in self.solution.outputs:
             for input_widget in self.iterate_input_widgets():
                 if output_ir.resource == input_widget.item.id:
@@ -434,6 +607,13 @@ class SatisfactorySolverMain(qtw.QApplication):
             plan = solve.Problem.from_dict(yaml.safe_load(file))
         self.clearWindow()
         self.output_show_box.setItem(self.game_data.items[plan.target])
+        if len(plan.targets) > 1 or plan.ratio:
+            self.plan_targets = (plan.targets, plan.ratio)
+            kind = 'Ratio' if plan.ratio else 'Weight'
+            self.output_show_box.setToolTip('\n'.join(
+                f"{self.game_data.items[item_id].display}: {kind} {weight:g}"
+                for item_id, weight in plan.targets.items()
+            ))
         for ir in plan.inputs:
             item = self.game_data.items[ir.resource]
             self.add_input(item, ir.rate)
@@ -452,15 +632,16 @@ class SatisfactorySolverMain(qtw.QApplication):
                 return
             self.current_file = file_name
         with open(self.current_file, 'w') as file:
-            yaml.dump(problem.to_dict(), file)
+            # Keep the first target first, it is the one the plan is shown by
+            yaml.dump(problem.to_dict(), file, sort_keys=False)
 
     def saveSvg(self):
         filename, img_kind = qtw.QFileDialog.getSaveFileName(
             self.w, "Save Implementation Image File", 'factory.svg', 'Vector Image (*.svg);;Raster Image (*.png)')
         if filename == '':
             return
-        visualize(self.solution, self.game_data, image_file=filename,
-                  recipe_distribute=self.distAct.isChecked())
+        visualize.visualize(self.solution, self.game_data, image_file=filename,
+                            recipe_distribute=self.distAct.isChecked())
 
     def run(self):
         self.w.show()
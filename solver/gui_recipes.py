@@ -3,13 +3,11 @@ import yaml
 
 import PySide6.QtWidgets as qtw
 import PySide6.QtCore as qtc
-from appdirs import user_config_dir
-
-from .config import AlternateRecipeConfiguration
+from .config import AlternateRecipeConfiguration, config_dir
 
 
 class TreeItem:
-    def __init__(self, *args, recipe=None, game_data=None, label=None, checked=False, children=None):
+    def __init__(self, *args, recipe=None, game_data=None, label=None, checked=qtc.Qt.Unchecked, children=None):
         self.parent = None
         self.row = None
         assert recipe is not None or label is not None
@@ -68,9 +66,70 @@ class TreeModel(qtc.QAbstractItemModel):
         dfs(self.root_item)
 
     def check_all(self, is_enable):
-        set_state = qtc.Qt.Checked if is_enable else qtc.Qt.Unchecked
-        for child in self.root_item.children:
-            self.dfs(child, set_state)
+        self.apply_states(lambda recipe_id: is_enable)
+
+    def apply_states(self, is_enabled):
+        """Set every recipe to is_enabled(recipe_id) in a single pass.
+
+        The new states are worked out bottom up first, then applied inside
+        one model reset if any differ. dataChanged only covers the indexes it
+        names, and views clip their repaint to those rows, so it can't stand
+        in for changes all over the tree.
+        """
+        changes = []
+
+        def post_order(item):
+            states = []
+            for child in item.children:
+                if child.recipe is not None:
+                    state = qtc.Qt.Checked if is_enabled(child.recipe.id) else qtc.Qt.Unchecked
+                else:
+                    state = post_order(child)
+                if child.checked != state:
+                    changes.append((child, state))
+                states.append(state)
+            return self.combined_state(states)
+
+        post_order(self.root_item)
+        if changes:
+            self.beginResetModel()
+            for item, state in changes:
+                item.checked = state
+            self.endResetModel()
+
+    @staticmethod
+    def children_state(item):
+        return TreeModel.combined_state(child.checked for child in item.children)
+
+    @staticmethod
+    def combined_state(states):
+        checked = False
+        partially = False
+        unchecked = False
+        for state in states:
+            if state == qtc.Qt.Checked:
+                checked = True
+            elif state == qtc.Qt.PartiallyChecked:
+                partially = True
+            else:
+                unchecked = True
+        if partially or (checked and unchecked):
+            return qtc.Qt.PartiallyChecked
+        elif checked:
+            return qtc.Qt.Checked
+        return qtc.Qt.Unchecked
+
+    def label_items(self, item=None):
+        """Every item under item that groups recipes, parents first"""
+        if item is None:
+            item = self.root_item
+        for child in item.children:
+            if child.recipe is None:
+                yield child
+                yield from self.label_items(child)
+
+    def item_index(self, item):
+        return self.createIndex(item.row, 0, item)
 
     def setData(self, index, value, role):
         if role == qtc.Qt.CheckStateRole:
@@ -91,7 +150,7 @@ class TreeModel(qtc.QAbstractItemModel):
         if item.checked != set_state:
             item.checked = set_state
             index = self.createIndex(item.row, 0, item)
-            self.dataChanged.emit(index, index, qtc.Qt.CheckStateRole)
+            self.dataChanged.emit(index, index, [qtc.Qt.CheckStateRole])
             for child in item.children:
                 self.dfs(child, set_state)
 
@@ -99,26 +158,11 @@ class TreeModel(qtc.QAbstractItemModel):
         set_state = qtc.Qt.Checked if is_enable else qtc.Qt.Unchecked
 
         def upward(item):
-            checked = False
-            partially = False
-            unchecked = False
-            for child in item.children:
-                if child.checked == qtc.Qt.Checked:
-                    checked = True
-                elif child.checked == qtc.Qt.PartiallyChecked:
-                    partially = True
-                else:
-                    unchecked = True
             previous = item.checked
-            if partially or (checked and unchecked):
-                item.checked = qtc.Qt.PartiallyChecked
-            elif checked:
-                item.checked = qtc.Qt.Checked
-            else:
-                item.checked = qtc.Qt.Unchecked
+            item.checked = self.children_state(item)
             if previous != item.checked:
                 index = self.createIndex(item.row, 0, item)
-                self.dataChanged.emit(index, index, qtc.Qt.CheckStateRole)
+                self.dataChanged.emit(index, index, [qtc.Qt.CheckStateRole])
                 if item.parent != self.root_item:
                     upward(item.parent)
 
@@ -194,11 +238,9 @@ class TreeModel(qtc.QAbstractItemModel):
 class AlternateRecipeWindow(qtw.QWidget):
     def __init__(self, game_data):
         super().__init__()
-        config_dir = user_config_dir(
-            'satisfactory-solver', 'robot_rover')
-        os.makedirs(config_dir, exist_ok=True)
+        os.makedirs(config_dir(), exist_ok=True)
         self.default_location = os.path.join(
-            config_dir, 'default_recipes.yaml')
+            config_dir(), 'default_recipes.yaml')
 
         self.setWindowTitle('Enabled Recipes')
         self.resize(300, 500)
@@ -224,6 +266,10 @@ class AlternateRecipeWindow(qtw.QWidget):
         self.recipe_view.setModel(self.recipe_model)
         self.recipe_view.setHeaderHidden(True)
         self.layout.addWidget(self.recipe_view)
+        # Applying a config resets the model, which collapses the whole view
+        self.expanded = []
+        self.recipe_model.modelAboutToBeReset.connect(self.save_expanded)
+        self.recipe_model.modelReset.connect(self.restore_expanded)
 
         self.bottom_layout = qtw.QGridLayout()
         self.layout.addLayout(self.bottom_layout)
@@ -263,12 +309,21 @@ class AlternateRecipeWindow(qtw.QWidget):
 
         self.load_config(self.default_location)
 
+    def save_expanded(self):
+        self.expanded = [
+            item for item in self.recipe_model.label_items()
+            if self.recipe_view.isExpanded(self.recipe_model.item_index(item))
+        ]
+
+    def restore_expanded(self):
+        for item in self.expanded:
+            self.recipe_view.setExpanded(self.recipe_model.item_index(item), True)
+        self.expanded = []
+
     def from_recipe_config(self, config):
-        self.recipe_model.check_all(False)
-        for enabled_recipe_id, enabled in config.enabled_recipes.items():
-            if enabled:
-                self.recipe_model.propagate_check(
-                    self.recipe_model.item_lookup[enabled_recipe_id], True)
+        enabled_recipes = config.enabled_recipes
+        self.recipe_model.apply_states(
+            lambda recipe_id: enabled_recipes.get(recipe_id, False))
 
     def to_recipe_config(self):
         return AlternateRecipeConfiguration({
@@ -313,16 +368,17 @@ class AlternateRecipeWindow(qtw.QWidget):
                 yaml.safe_load(file))
         self.from_recipe_config(config)
 
-    def build_tree(self, game_data):
+    @staticmethod
+    def build_tree(game_data):
         root = TreeItem(label='Recipes')
+        labels = {}
 
         def get_or_insert(item, val):
-            for child in item.children:
-                if child.label == val:
-                    return child
-            new = TreeItem(label=val)
-            item.add_child(new)
-            return new
+            child = labels.get((item, val))
+            if child is None:
+                child = labels[(item, val)] = TreeItem(label=val)
+                item.add_child(child)
+            return child
 
         for recipe in game_data.recipes.values():
             parent = root
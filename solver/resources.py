@@ -1,4 +1,6 @@
 class ItemRate:
+    __slots__ = ('resource', 'rate')
+
     def __init__(self, resource, rate):
         assert isinstance(resource, str)
         self.resource = resource
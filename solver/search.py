@@ -0,0 +1,77 @@
+from rapidfuzz import fuzz, process, utils
+
+# Below this many trigram candidates, every name is scored instead
+MIN_CANDIDATES = 20
+PREFIX_BONUS = 10
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Fuzzy search over display names, indexed once up front.
+
+    Each query is only scored against the names sharing a trigram or a word
+    prefix with it, using the same WRatio scorer as fuzzywuzzy's
+    extractBests, and falls back to scoring everything when too few share
+    one.
+    """
+
+    def __init__(self, entries):
+        self.names = list(entries)
+        self.values = [entries[name] for name in self.names]
+        self.processed = [utils.default_process(name) for name in self.names]
+        self.trigram_index = {}
+        self.prefix_index = {}
+        for index, name in enumerate(self.processed):
+            for trigram in trigrams(name):
+                self.trigram_index.setdefault(trigram, []).append(index)
+            for word in name.split():
+                self.prefix_index.setdefault(word[:2], []).append(index)
+
+    def candidates(self, term):
+        found = set()
+        for trigram in trigrams(term):
+            found.update(self.trigram_index.get(trigram, ()))
+        for word in term.split():
+            found.update(self.prefix_index.get(word[:2], ()))
+        return found
+
+    def search(self, term, limit=20):
+        """Best (name, value) pairs for term, best first"""
+        term = utils.default_process(term)
+        if not term:
+            return []
+        candidates = self.candidates(term)
+        if len(candidates) < MIN_CANDIDATES:
+            candidates = range(len(self.names))
+        # In entry order, so ties go to the names listed first
+        choices = {index: self.processed[index] for index in sorted(candidates)}
+        matches = process.extract(term, choices, scorer=fuzz.WRatio,
+                                  processor=None, limit=limit * 2)
+        # WRatio favours long names that merely contain the term, so lift the
+        # names that start with it, like the item being typed out
+        matches.sort(key=lambda match: -(
+            match[1] + (PREFIX_BONUS if match[0].startswith(term) else 0)))
+        return [(self.names[index], self.values[index]) for _, _, index in matches[:limit]]
+
+
+def item_entries(game_data):
+    """Searchable names for every item.
+
+    Recipes and machines are found by name too, each entry leading to the
+    item a recipe makes. Item names come first so they win ties.
+    """
+    entries = {item.display: item for item in game_data.items.values()}
+    for recipe in game_data.recipes.values():
+        if recipe.id not in game_data.valid_recipes or not recipe.outputs:
+            continue
+        item = game_data.items[next(iter(recipe.outputs))]
+        if recipe.display != item.display:
+            entries.setdefault(f"{recipe.display} ({item.display})", item)
+        machine = game_data.machines.get(recipe.machine)
+        if machine is not None:
+            entries.setdefault(f"{machine.display}: {item.display}", item)
+    return entries
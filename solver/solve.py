@@ -2,46 +2,182 @@ from .resources import ItemRate
 from .util import to_from_dict
 
 import math
+import sys
+from abc import ABC, abstractmethod
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from pulp import LpMaximize, LpMinimize, LpProblem, LpStatus, lpSum, LpVariable
+from pulp import LpMaximize, LpMinimize, LpProblem, LpStatus, lpSum, LpVariable, PULP_CBC_CMD
 
 
 class Problem:
-    def __init__(self, target, inputs):
-        self.target = target
+    """Maximize output of the target from the given inputs.
+
+    target is an item id, or a dict of item ids to weights for several
+    products. The LP maximizes the weighted sum of their production, or with
+    ratio set, the number of sets made at exactly those output ratios.
+    """
+
+    def __init__(self, target, inputs, ratio=False):
+        if isinstance(target, str):
+            target = {target: 1.0}
+        self.targets = dict(target)
         self.inputs = inputs
+        self.ratio = ratio
+
+    @property
+    def target(self):
+        """The first target, which names the plan"""
+        return next(iter(self.targets))
 
     def to_dict(self):
-        return {
-            'target': self.target,
-            'inputs': {
-                ir.resource: ir.rate for ir in self.inputs
-            }
+        d = {}
+        if len(self.targets) == 1 and self.targets[self.target] == 1 and not self.ratio:
+            d['target'] = self.target
+        else:
+            d['targets'] = dict(self.targets)
+            d['ratio'] = self.ratio
+        d['inputs'] = {
+            ir.resource: ir.rate for ir in self.inputs
         }
+        return d
 
     @classmethod
     def from_dict(cls, d):
-        return cls(target=d['target'], inputs=[
+        return cls(target=d['targets'] if 'targets' in d else d['target'], inputs=[
             ItemRate(key, val) for key, val in d['inputs'].items()
-        ])
+        ], ratio=d.get('ratio', False))
+
+
+class IntegerOptions:
+    """Solve with a whole number of machines per recipe.
+
+    Every machine of a recipe runs at the same clock speed, somewhere between
+    min_clock and max_clock (1.0 is 100%). time_limit caps the whole solve in
+    seconds, after which the best plan found so far is returned, and mip_gap
+    stops the search once the relative gap to the bound is that small.
+    """
+
+    def __init__(self, min_clock=0.01, max_clock=1.0, time_limit=None, mip_gap=None):
+        self.min_clock = min_clock
+        self.max_clock = max_clock
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+
+    def time_left(self, start, share=1.0):
+        """Seconds left of this share of the time limit, None if unlimited"""
+        if self.time_limit is None:
+            return None
+        return max(self.time_limit * share - (time.monotonic() - start), 0.01)
+
+
+class SolveStats:
+    """Where a solve spent its time, and the size of the model it solved.
+
+    timings holds wall-clock seconds per stage in the order they ran, and
+    iterations the solver's iteration count per stage where it reports one.
+    """
+
+    def __init__(self, timings=None, variables=0, constraints=0, nonzeros=0,
+                 status=None, iterations=None):
+        self.timings = timings if timings is not None else {}
+        self.variables = variables
+        self.constraints = constraints
+        self.nonzeros = nonzeros
+        self.status = status
+        self.iterations = iterations if iterations is not None else {}
+        self.last = time.perf_counter()
+
+    def restart(self):
+        """Time the next lap from now, e.g. when a later stage starts elsewhere"""
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0) + now - self.last
+        self.last = now
+
+    def set_size(self, variables, constraints, nonzeros):
+        self.variables = variables
+        self.constraints = constraints
+        self.nonzeros = nonzeros
+
+    def to_dict(self):
+        return {
+            'timings': self.timings,
+            'variables': self.variables,
+            'constraints': self.constraints,
+            'nonzeros': self.nonzeros,
+            'status': self.status,
+            'iterations': self.iterations
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**d)
+
+    def __repr__(self):
+        timings = ', '.join(
+            f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in self.timings.items()
+        )
+        iterations = '+'.join(str(count) for count in self.iterations.values())
+        return (f"{timings} | {self.variables} vars x {self.constraints} rows, "
+                f"{self.nonzeros} nz | {self.status}"
+                + (f", {iterations} iterations" if iterations else ""))
+
+
+# Share of the time limit the max-target stage may use before the machine
+# minimization stage gets the rest
+FIRST_STAGE_TIME_SHARE = 0.7
+
+
+def report_mip(stage, incumbent, bound=None, gap=None):
+    """Progress of an integer solve, on stderr so stdout only holds the result.
+
+    Backends turn their solver's own log off and report through this instead.
+    """
+    report = f"MIP {stage}: incumbent {incumbent:g}"
+    if bound is not None:
+        report += f", bound {bound:g}"
+    if gap is not None:
+        report += f", gap {gap:.2%}"
+    print(report, file=sys.stderr)
 
 
 class Result:
-    def __init__(self, problem, objective, recipes, outputs, throughput):
+    def __init__(self, problem, objective, recipes, outputs, throughput,
+                 shadow_prices=None, reduced_costs=None, machines=None, mip_gap=None,
+                 stats=None):
         self.problem = problem
         self.objective = objective
         self.recipes = recipes
         self.outputs = outputs
         self.throughput = throughput
+        # Target output gained per extra unit/min of each item, and per unit of
+        # each unused recipe forced into the plan (zero entries are left out)
+        self.shadow_prices = shadow_prices if shadow_prices is not None else {}
+        self.reduced_costs = reduced_costs if reduced_costs is not None else {}
+        # Whole machine counts per recipe and the final relative gap of the
+        # target, only set when solved with IntegerOptions
+        self.machines = machines
+        self.mip_gap = mip_gap
+        self.stats = stats
 
     def to_dict(self):
         return {
             'problem': self.problem.to_dict(),
             'objective': self.objective,
             'recipes': self.recipes,
-            'outputs': {ir.resource: ir.rate for ir in self.outputs}
+            'outputs': {ir.resource: ir.rate for ir in self.outputs},
+            'throughput': self.throughput,
+            'shadow_prices': self.shadow_prices,
+            'reduced_costs': self.reduced_costs,
+            'machines': self.machines,
+            'mip_gap': self.mip_gap,
+            'stats': self.stats.to_dict() if self.stats is not None else None
         }
 
+    @classmethod
     def from_dict(cls, d):
         return cls(
             problem=Problem.from_dict(d['problem']),
@@ -49,10 +185,17 @@ class Result:
             recipes=d['recipes'],
             outputs=[
                 ItemRate(key, val) for key, val in d['outputs'].items()
-            ]
+            ],
+            throughput=d['throughput'],
+            shadow_prices=d.get('shadow_prices'),
+            reduced_costs=d.get('reduced_costs'),
+            machines=d.get('machines'),
+            mip_gap=d.get('mip_gap'),
+            stats=SolveStats.from_dict(d['stats']) if d.get('stats') else None
         )
 
     def __repr__(self):
+        machines = self.machines if self.machines is not None else {}
         return "\n".join([
             f"### {self.problem.target} | {self.objective} ###",
             "--- Inputs ---"
@@ -61,99 +204,677 @@ class Result:
         ] + [
             "--- Recipies ---"
         ] + [
-            f"{recipe_id}: <{quantity}>" for recipe_id, quantity in self.recipes.items()
-        ] + [
+            f"{recipe_id}: <{quantity}>" + (
+                f" x{machines[recipe_id]}" if recipe_id in machines else ""
+            ) for recipe_id, quantity in self.recipes.items()
+        ] + ([
+            f"--- MIP gap {self.mip_gap:.2%} ---"
+        ] if self.mip_gap is not None else []) + [
             "--- Outputs ---"
         ] + [
             f"{output}" for output in self.outputs
+        ] + [
+            "--- Shadow Prices ---"
+        ] + [
+            f"{item_id}: {price}" for item_id, price in
+            sorted(self.shadow_prices.items(), key=lambda kv: -kv[1])
+        ] + [
+            "--- Reduced Costs ---"
+        ] + [
+            f"{recipe_id}: {cost}" for recipe_id, cost in
+            sorted(self.reduced_costs.items(), key=lambda kv: -kv[1])
         ])
 
 
-def optimize(problem, game_data, recipe_config):
+class CompiledModel(ABC):
+    """LP over a fixed recipe set, built once and re-solved for many problems.
 
-    filtered_recipes = {
-        recipe_id: recipe for recipe_id, recipe in game_data.recipes.items()
-        if recipe_config.use_recipe(recipe_id)
-    }
+    The item x recipe stoichiometry is stored sparsely as one list of
+    (item index, rate) pairs per recipe. Backends compile it into their own
+    model once; solving a problem only swaps the input RHS and the objective.
 
-    capital_str = ",".join(ir.resource for ir in problem.inputs)
-    model_name = f'[{capital_str}]->{problem.target}'
-    model = LpProblem(name=model_name, sense=LpMaximize)
+    For ratio problems one more column follows the recipes: a set that
+    consumes each target at its ratio, whose quantity is then maximized.
+    """
 
-    recipe_variables = [
-        LpVariable(name=f"{recipie_id}", lowBound=0) for recipie_id in filtered_recipes
-    ]
+    def __init__(self, game_data, recipes, items, ratios=None):
+        self.game_data = game_data
+        self.recipes = recipes
+        self.items = items
+        self.item_index = {
+            item_id: index for index, item_id in enumerate(self.items)
+        }
+
+        self.columns = [
+            [(self.item_index[ir.resource], ir.rate) for ir in recipe.get_rates()]
+            for recipe in self.recipes
+        ]
+
+        self.power = [
+            game_data.machines[recipe.machine].power for recipe in self.recipes
+        ]
 
-    constraint_terms = {
-        resource_id: [] for resource_id in game_data.items
-    }
+        self.set_column = None
+        if ratios is not None:
+            self.set_column = [
+                (self.item_index[item_id], -ratio) for item_id, ratio in ratios.items()
+            ]
+            self.columns.append(self.set_column)
+            self.power.append(0)
+        self.objective_rows = {}
+        self.nonzeros = sum(len(column) for column in self.columns)
 
-    for recipe, variable in zip(filtered_recipes.values(), recipe_variables):
-        if all(resource in game_data.items for resource in recipe.inputs) \
-                and all(resource in game_data.items for resource in recipe.outputs):
-            for item_rate in recipe.get_rates():
-                constraint_terms[item_rate.resource].append(
-                    variable * item_rate.rate)
+    def objective_row(self, problem):
+        """Sparse (column indices, coefficients) of the production to maximize.
 
-    for item_rate in problem.inputs:
-        constraint_terms[item_rate.resource].append(item_rate.rate)
+        Also returns the weight of each target item's index, which is how much
+        the objective gains directly from a unit of that item as input.
+        """
+        if self.set_column is not None:
+            return [len(self.columns) - 1], [1.0], {}
+        key = tuple(problem.targets.items())
+        row = self.objective_rows.get(key)
+        if row is None:
+            weights = {
+                self.item_index[item_id]: weight for item_id, weight in problem.targets.items()
+            }
+            indices = []
+            values = []
+            for column_index, column in enumerate(self.columns):
+                value = sum(
+                    weights[item_index] * rate for item_index, rate in column
+                    if item_index in weights
+                )
+                if value != 0:
+                    indices.append(column_index)
+                    values.append(value)
+            row = (indices, values, weights)
+            self.objective_rows[key] = row
+        return row
 
-    objective = lpSum(constraint_terms[problem.target])
+    def objective_constant(self, problem, rhs):
+        """Part of the objective supplied directly by the inputs"""
+        weights = self.objective_row(problem)[2]
+        return sum(weight * rhs[item_index] for item_index, weight in weights.items())
 
-    constraints = {
-        resource_id: (lpSum(terms) >= 0, f"{resource_id}_production") for resource_id, terms in constraint_terms.items()
-    }
+    def input_vector(self, inputs):
+        rhs = [0.0] * len(self.items)
+        for ir in inputs:
+            rhs[self.item_index[ir.resource]] += ir.rate
+        return rhs
 
-    for constraint, label in constraints.values():
-        model.constraints[label] = constraint
+    def item_values(self, quantities, rhs):
+        """Net rate of every item for the given recipe quantities"""
+        values = list(rhs)
+        for column, quantity in zip(self.columns, quantities):
+            for item_index, rate in column:
+                values[item_index] += rate * quantity
+        return values
 
-    model.setObjective(objective)
+    @abstractmethod
+    def solve(self, problem, stats):
+        """Two-stage LP solve, returns a Result or None if infeasible"""
 
-    status = model.solve()
-    if status == 1:
-        target_production = model.objective.value()
-        model.sense = LpMinimize
-        power_objective_terms = [
-            variable * game_data.machines[recipie.machine].power for variable, recipie in zip(recipe_variables, filtered_recipes.values())
-        ]
-        target_constraint = lpSum(
-            constraint_terms[problem.target]) >= target_production
-        model.constraints[f"objective_production_{problem.target}"] = target_constraint
-        model.setObjective(lpSum(power_objective_terms))
-        model.solve()
+    @abstractmethod
+    def solve_integer(self, problem, options, stats):
+        """Two-stage solve with whole machine counts, returns a Result or None"""
+
+    def solve_without_recipes(self, problem, options, stats):
+        """Pruning can leave nothing to run, which backends can't be given"""
+        stats.set_size(len(self.columns), len(self.items), self.nonzeros)
+        item_values = self.input_vector(problem.inputs)
+        if any(value < 0 for value in item_values):
+            stats.status = 'Infeasible'
+            return None
+        stats.status = 'Optimal'
+        if options is not None:
+            return self.make_result(problem, 0.0, [], item_values, stats,
+                                    machines=[], mip_gap=0.0)
+        return self.make_result(problem, 0.0, [], item_values, stats)
+
+    def integer_size(self):
+        """Variables, constraints and nonzeros once machine counts are added"""
+        recipes = len(self.recipes)
+        return (len(self.columns) + recipes, len(self.items) + 2 * recipes,
+                self.nonzeros + 4 * recipes)
+
+    def make_result(self, problem, objective, quantities, item_values, stats,
+                    row_duals=None, column_duals=None, machines=None, mip_gap=None):
+        """Build a Result from the backend's solution.
+
+        row_duals and column_duals come from the max-target stage, as the
+        change in target output per unit of item RHS and of recipe quantity.
+        machines are the per-recipe counts of an integer solve.
+        """
         throughput = {}
         for ir in problem.inputs:
             throughput[ir.resource] = throughput.get(ir.resource, 0) + ir.rate
-        for recipe, variable in zip(filtered_recipes.values(), recipe_variables):
+        for recipe, quantity in zip(self.recipes, quantities):
             for ir in recipe.output_rates():
-                if variable.value() > 0:
-                    throughput[ir.resource] = throughput.get(ir.resource, 0) + ir.rate * variable.value()
+                if quantity > 0:
+                    throughput[ir.resource] = throughput.get(ir.resource, 0) + ir.rate * quantity
+
+        if self.set_column is not None and len(quantities) == len(self.columns):
+            # Sets only group the targets, the targets themselves are the output
+            item_values = list(item_values)
+            for item_index, rate in self.set_column:
+                item_values[item_index] -= rate * quantities[-1]
+
+        shadow_prices = {}
+        if row_duals is not None:
+            weights = self.objective_row(problem)[2]
+            for item_index, (item_id, dual) in enumerate(zip(self.items, row_duals)):
+                # Input of a target itself also counts towards it directly
+                price = dual + weights.get(item_index, 0)
+                if not math.isclose(price, 0, abs_tol=0.00001):
+                    shadow_prices[item_id] = price
 
-        result = Result(problem, model.objective.value(), {
-            recipie.id: variable.value() for recipie, variable in zip(filtered_recipes.values(), recipe_variables)
-            if not math.isclose(variable.value(), 0, abs_tol=0.00001)
+        reduced_costs = {}
+        if column_duals is not None:
+            for recipe, quantity, dual in zip(self.recipes, quantities, column_duals):
+                if math.isclose(quantity, 0, abs_tol=0.00001) \
+                        and not math.isclose(dual, 0, abs_tol=0.00001):
+                    reduced_costs[recipe.id] = dual
+
+        machine_counts = None
+        if machines is not None:
+            machine_counts = {
+                recipe.id: round(count) for recipe, count in zip(self.recipes, machines)
+                if round(count) > 0
+            }
+
+        result = Result(problem, objective, {
+            recipe.id: quantity for recipe, quantity in zip(self.recipes, quantities)
+            if not math.isclose(quantity, 0, abs_tol=0.00001)
         },
             [
-            ItemRate(resource, constraint[0].value()) for resource, constraint in constraints.items()
-            if constraint[0].value() is not None
-            if not math.isclose(constraint[0].value(), 0, rel_tol=0.00001, abs_tol=0.00001)
-        ], throughput)
+            ItemRate(resource, value) for resource, value in zip(self.items, item_values)
+            if value is not None
+            if not math.isclose(value, 0, rel_tol=0.00001, abs_tol=0.00001)
+        ], throughput, shadow_prices, reduced_costs, machine_counts, mip_gap, stats)
+        stats.lap('extract')
         return result
 
 
+class PulpModel(CompiledModel):
+    def __init__(self, game_data, recipes, items, ratios=None):
+        super().__init__(game_data, recipes, items, ratios)
+        self.model = LpProblem(name='recipes', sense=LpMaximize)
+        self.variables = [
+            LpVariable(name=f"{recipe.id}", lowBound=0) for recipe in self.recipes
+        ]
+        if self.set_column is not None:
+            self.variables.append(LpVariable(name='target_sets', lowBound=0))
+
+        row_terms = [[] for _ in self.items]
+        for variable, column in zip(self.variables, self.columns):
+            for item_index, rate in column:
+                row_terms[item_index].append(variable * rate)
+        self.rows = [lpSum(terms) for terms in row_terms]
+
+        self.constraints = []
+        for item_id, row in zip(self.items, self.rows):
+            constraint = row >= 0
+            self.model.addConstraint(constraint, f"{item_id}_production")
+            self.constraints.append(constraint)
+
+        self.power_objective = lpSum(
+            variable * power for variable, power in zip(self.variables, self.power)
+        )
+
+    def lp_solver(self):
+        """PuLP solver for the LP stages"""
+        # CBC runs as a separate binary and would log straight to stdout
+        return PULP_CBC_CMD(msg=False)
+
+    def mip_solver(self, time_limit, mip_gap, warm_start=False):
+        return PULP_CBC_CMD(msg=False, timeLimit=time_limit, gapRel=mip_gap, warmStart=warm_start)
+
+    def report_stage(self, model, stage):
+        """CBC's bound doesn't make it back through PuLP, only its incumbent"""
+        report_mip(stage, model.objective.value())
+
+    def objective_expression(self, problem, rhs):
+        indices, values, _ = self.objective_row(problem)
+        return lpSum(
+            self.variables[index] * value for index, value in zip(indices, values)
+        ) + self.objective_constant(problem, rhs)
+
+    def solve(self, problem, stats):
+        stats.set_size(len(self.variables), len(self.constraints), self.nonzeros)
+        rhs = self.input_vector(problem.inputs)
+        for constraint, item_rhs in zip(self.constraints, rhs):
+            constraint.constant = item_rhs
+        target_row = self.objective_expression(problem, rhs)
+
+        # CBC's iteration counts don't make it back through PuLP
+        self.model.sense = LpMaximize
+        self.model.setObjective(target_row)
+        status = self.model.solve(self.lp_solver())
+        stats.lap('first')
+        stats.status = LpStatus[status]
+        if status != 1:
+            return None
+
+        target_production = self.model.objective.value()
+        row_duals = None
+        column_duals = None
+        # Not every PuLP solver reads duals back
+        if all(constraint.pi is not None for constraint in self.constraints):
+            # Constraints hold the RHS as -constant, so flip the sign of pi
+            row_duals = [-constraint.pi for constraint in self.constraints]
+            column_duals = [variable.dj for variable in self.variables]
+        target_label = "objective_production"
+        self.model.sense = LpMinimize
+        self.model.addConstraint(target_row >= target_production, target_label)
+        self.model.setObjective(self.power_objective)
+        try:
+            stats.status = LpStatus[self.model.solve(self.lp_solver())]
+        finally:
+            del self.model.constraints[target_label]
+        stats.lap('second')
+
+        return self.make_result(
+            problem, self.model.objective.value(),
+            [variable.value() for variable in self.variables],
+            [constraint.value() for constraint in self.constraints],
+            stats, row_duals, column_duals
+        )
+
+    def solve_integer(self, problem, options, stats):
+        start = time.monotonic()
+        stats.set_size(*self.integer_size())
+        rhs = self.input_vector(problem.inputs)
+        target_row = self.objective_expression(problem, rhs)
+
+        # A separate model, so the LP above keeps its continuous variables
+        model = LpProblem(name='machines', sense=LpMaximize)
+        machines = [
+            LpVariable(name=f"{recipe.id}_machines", lowBound=0, cat='Integer')
+            for recipe in self.recipes
+        ]
+        for item_id, row, item_rhs in zip(self.items, self.rows, rhs):
+            model.addConstraint(row + item_rhs >= 0, f"{item_id}_production")
+        for recipe, variable, count in zip(self.recipes, self.variables, machines):
+            model.addConstraint(variable <= options.max_clock * count, f"{recipe.id}_max_clock")
+            model.addConstraint(variable >= options.min_clock * count, f"{recipe.id}_min_clock")
+
+        stats.lap('build')
+
+        model.setObjective(target_row)
+        model.solve(self.mip_solver(options.time_left(start, FIRST_STAGE_TIME_SHARE),
+                                    options.mip_gap))
+        stats.lap('first')
+        stats.status = LpStatus[model.status]
+        if model.sol_status not in (1, 2):
+            return None
+        self.report_stage(model, 'target')
+        target_production = model.objective.value()
+        first = [variable.value() for variable in self.variables + machines]
+
+        model.sense = LpMinimize
+        model.addConstraint(target_row >= target_production, "objective_production")
+        model.setObjective(lpSum(machines))
+        # The first stage's plan is feasible here, so there is always a fallback
+        model.solve(self.mip_solver(options.time_left(start), options.mip_gap, warm_start=True))
+        stats.lap('second')
+        stats.status = LpStatus[model.status]
+        if model.sol_status in (1, 2):
+            self.report_stage(model, 'machines')
+            values = [variable.value() for variable in self.variables + machines]
+        else:
+            values = first
+
+        quantities = values[:len(self.variables)]
+        return self.make_result(
+            problem, sum(quantity * power for quantity, power in zip(quantities, self.power)),
+            quantities, self.item_values(quantities, rhs), stats,
+            # CBC does not report its final bound back through PuLP
+            machines=values[len(self.variables):]
+        )
+
+
+class PulpHighsModel(PulpModel):
+    """The PuLP model solved by HiGHS in-process, without CBC's temp files"""
+
+    def lp_solver(self):
+        # PuLP only has a HiGHS interface from 2.8, older ones still run the other backends
+        from pulp import HiGHS
+        return HiGHS(msg=False)
+
+    def mip_solver(self, time_limit, mip_gap, warm_start=False):
+        from pulp import HiGHS
+        # PuLP's HiGHS interface takes no MIP start, the first stage is the fallback
+        return HiGHS(msg=False, timeLimit=time_limit, gapRel=mip_gap)
+
+    def report_stage(self, model, stage):
+        info = model.solverModel.getInfo()
+        # PuLP hands HiGHS a maximization negated and without its constant
+        sign = -1 if model.sense == LpMaximize else 1
+        report_mip(stage, model.objective.value(),
+                   sign * info.mip_dual_bound + model.objective.constant, info.mip_gap)
+
+
+BACKENDS = ('highs', 'pulp', 'pulp-highs', 'scipy')
+DEFAULT_BACKEND = 'highs'
+MODEL_CACHE_SIZE = 8
+PRUNED_CACHE_SIZE = 32
+_compiled_models = {}
+
+
+def get_backend(backend):
+    if backend == 'highs':
+        from .solve_highs import HighsModel
+        return HighsModel
+    elif backend == 'pulp':
+        return PulpModel
+    elif backend == 'pulp-highs':
+        return PulpHighsModel
+    elif backend == 'scipy':
+        from .solve_scipy import ScipyModel
+        return ScipyModel
+    raise ValueError(f"Unknown solver backend '{backend}'")
+
+
+def prune_recipes(game_data, recipes, targets, supplied, required):
+    """Recipes that can run on the supplied items and contribute to a target.
+
+    A recipe can only run when each of its inputs is supplied or made by
+    another recipe that can run, which still admits self-sustaining byproduct
+    loops. Of those, only recipes whose outputs lead to a target or to a
+    required item can change the optimum; the rest would solve to zero.
+    """
+    runnable = {recipe.id for recipe in recipes}
+    producer_count = {}
+    for recipe in recipes:
+        for item_id in recipe.outputs:
+            producer_count[item_id] = producer_count.get(item_id, 0) + 1
+
+    def available(item_id):
+        return item_id in supplied or producer_count.get(item_id, 0) > 0
+
+    stalled = [
+        recipe for recipe in recipes
+        if not all(available(item_id) for item_id in recipe.inputs)
+    ]
+    while stalled:
+        recipe = stalled.pop()
+        if recipe.id not in runnable:
+            continue
+        runnable.remove(recipe.id)
+        for item_id in recipe.outputs:
+            producer_count[item_id] -= 1
+            if not available(item_id):
+                stalled.extend(
+                    consumer for consumer in game_data.consumers.get(item_id, [])
+                    if consumer.id in runnable
+                )
+
+    needed = set(targets) | required
+    frontier = list(needed)
+    kept = set()
+    while frontier:
+        item_id = frontier.pop()
+        for recipe in game_data.producers.get(item_id, []):
+            if recipe.id in runnable and recipe.id not in kept:
+                kept.add(recipe.id)
+                for input_id in recipe.inputs:
+                    if input_id not in needed:
+                        needed.add(input_id)
+                        frontier.append(input_id)
+
+    return [recipe for recipe in recipes if recipe.id in kept]
+
+
+class RecipeSolver:
+    """Solves problems over one recipe config.
+
+    Each problem is solved on a sub-LP pruned to the recipes that can affect
+    it. The pruned model only depends on the target and on which items are
+    supplied or required, so it is compiled once per problem shape and then
+    re-solved with new input rates.
+    """
+
+    def __init__(self, game_data, recipe_config, backend=DEFAULT_BACKEND):
+        self.game_data = game_data
+        self.model_class = get_backend(backend)
+        # Recipes with unknown items could never be used in a solution
+        self.recipes = [
+            recipe for recipe_id, recipe in game_data.recipes.items()
+            if recipe_config.use_recipe(recipe_id)
+            if recipe_id in game_data.valid_recipes
+        ]
+        self.models = {}
+        self.last_stats = None
+
+    def get_model(self, problem, stats=None):
+        # Pruning would quietly drop an unknown item, fail like the full LP did
+        for item_id in [*problem.targets, *(ir.resource for ir in problem.inputs)]:
+            if item_id not in self.game_data.items:
+                raise KeyError(item_id)
+        net_inputs = {}
+        for ir in problem.inputs:
+            net_inputs[ir.resource] = net_inputs.get(ir.resource, 0) + ir.rate
+        signs = frozenset(
+            (item_id, (rate > 0) - (rate < 0)) for item_id, rate in net_inputs.items()
+        )
+        # Weights only change the objective, but ratios are built into the model
+        ratios = dict(problem.targets) if problem.ratio else None
+        targets = tuple(sorted(ratios.items())) if problem.ratio else frozenset(problem.targets)
+        key = (targets, signs)
+        model = self.models.pop(key, None)
+        if model is None:
+            # An input at rate 0 still has a shadow price, so keep its consumers
+            supplied = {item_id for item_id, sign in signs if sign >= 0}
+            required = {item_id for item_id, sign in signs if sign < 0}
+            recipes = prune_recipes(self.game_data, self.recipes, problem.targets,
+                                    supplied, required)
+            if stats is not None:
+                stats.lap('prune')
+            used = set(problem.targets) | set(net_inputs)
+            for recipe in recipes:
+                used.update(recipe.inputs)
+                used.update(recipe.outputs)
+            items = [item_id for item_id in self.game_data.items if item_id in used]
+            print(f"Pruned LP for {', '.join(problem.targets)} to {len(recipes)}/{len(self.recipes)} recipes, "
+                  f"{len(items)}/{len(self.game_data.items)} items", file=sys.stderr)
+            model = self.model_class(self.game_data, recipes, items, ratios)
+            if stats is not None:
+                stats.lap('build')
+        elif stats is not None:
+            stats.lap('lookup')
+        # Re-insert so the dict stays ordered from least to most recently used
+        self.models[key] = model
+        while len(self.models) > PRUNED_CACHE_SIZE:
+            del self.models[next(iter(self.models))]
+        return model
+
+    def solve(self, problem, integer=None):
+        # Kept for the caller to inspect, even when the problem is infeasible
+        self.last_stats = stats = SolveStats()
+        model = self.get_model(problem, stats)
+        if not model.columns:
+            return model.solve_without_recipes(problem, integer, stats)
+        if integer is not None:
+            return model.solve_integer(problem, integer, stats)
+        return model.solve(problem, stats)
+
+
+def compile_model(game_data, recipe_config, backend=DEFAULT_BACKEND):
+    key = (id(game_data), recipe_config.enabled_ids(), backend)
+    cached = _compiled_models.pop(key, None)
+    if cached is None or cached.game_data is not game_data:
+        cached = RecipeSolver(game_data, recipe_config, backend)
+    # Re-insert so the dict stays ordered from least to most recently used
+    _compiled_models[key] = cached
+    while len(_compiled_models) > MODEL_CACHE_SIZE:
+        del _compiled_models[next(iter(_compiled_models))]
+    return cached
+
+
+def optimize(problem, game_data, recipe_config, backend=DEFAULT_BACKEND, integer=None):
+    """Solve problem, with whole machine counts when integer options are given"""
+    return compile_model(game_data, recipe_config, backend).solve(problem, integer)
+
+
+_worker_state = None
+
+
+def _init_worker(game_data, recipe_config, backend):
+    # Each worker unpickles the shared GameData once, not once per problem
+    global _worker_state
+    _worker_state = (game_data, recipe_config, backend)
+
+
+def _optimize_in_worker(index, problem):
+    game_data, recipe_config, backend = _worker_state
+    return index, optimize(problem, game_data, recipe_config, backend)
+
+
+def optimize_many(problems, game_data, recipe_config, backend=DEFAULT_BACKEND, max_workers=None):
+    """Solve problems across a process pool.
+
+    Yields (index, result, error) in completion order, where index is the
+    position of the problem in problems. A problem that raised has its
+    exception as error and None as result, the others still run.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(game_data, recipe_config, backend)) as pool:
+        futures = {
+            pool.submit(_optimize_in_worker, index, problem): index
+            for index, problem in enumerate(problems)
+        }
+        for future in as_completed(futures):
+            try:
+                index, result = future.result()
+            except Exception as e:
+                yield futures[future], None, e
+            else:
+                yield index, result, None
+
+
+TARGET_HELP = 'Target item id, or comma separated item:weight pairs'
+
+
+def parse_targets(text):
+    """Parse 'item' or 'item:weight,item:weight' into a dict of weights"""
+    targets = {}
+    for part in text.split(','):
+        item_id, _, weight = part.partition(':')
+        targets[item_id] = float(weight) if weight else 1.0
+    return targets
+
+
+def parse_args(args):
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m solver solve')
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND)
+    parser.add_argument('--integer', action='store_true',
+                        help='Solve for whole machine counts')
+    parser.add_argument('--min-clock', type=float, default=0.01,
+                        help='Lowest machine clock speed in integer mode, 1.0 is 100%%')
+    parser.add_argument('--max-clock', type=float, default=1.0,
+                        help='Highest machine clock speed in integer mode')
+    parser.add_argument('--time-limit', type=float, default=None,
+                        help='Seconds before returning the best integer plan found')
+    parser.add_argument('--mip-gap', type=float, default=None,
+                        help='Relative gap at which the integer search stops')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print stage timings and model size')
+    parser.add_argument('--ratio', action='store_true',
+                        help='Treat target weights as required output ratios')
+    parser.add_argument('target', help=TARGET_HELP)
+    parser.add_argument('inputs', nargs='*',
+                        help='Alternating input item ids and rates')
+    args = parser.parse_args(args)
+    args.target = parse_targets(args.target)
+    if len(args.inputs) % 2 != 0:
+        parser.error('every input item needs a rate')
+    it = iter(args.inputs)
+    args.inputs = [ItemRate(id, int(rate)) for id, rate in zip(it, it)]
+    return args
+
+
 def main(args):
     from . import game_parse
-    it = iter(args)
-    target = next(it)
-    inputs = []
-    try:
-        while True:
-            id = next(it)
-            rate = int(next(it))
-            inputs.append(ItemRate(id, rate))
-    except StopIteration:
-        pass
+    from .config import AlternateRecipeConfiguration
+    args = parse_args(args)
     game_data = game_parse.get_docs()
-    result = optimize(Problem(target, inputs), game_data)
+    recipe_config = AlternateRecipeConfiguration({
+        recipe_id: True for recipe_id in game_data.recipes
+    })
+    integer = None
+    if args.integer:
+        integer = IntegerOptions(args.min_clock, args.max_clock,
+                                 args.time_limit, args.mip_gap)
+    solver = compile_model(game_data, recipe_config, args.backend)
+    result = solver.solve(Problem(args.target, args.inputs, args.ratio), integer)
     print(result)
+    if args.profile:
+        print("--- Profile ---")
+        print(solver.last_stats)
     return result
+
+
+def find_plans(pattern):
+    import glob
+    import os
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*.yaml')
+    return sorted(glob.glob(pattern))
+
+
+def batch_main(args):
+    import argparse
+    import json
+    import yaml
+    from . import game_parse
+    from .config import AlternateRecipeConfiguration
+
+    parser = argparse.ArgumentParser(prog='python -m solver batch')
+    parser.add_argument('plans', help='Directory of factory plans or a glob')
+    parser.add_argument('-o', '--output', help='JSONL output file, defaults to stdout')
+    parser.add_argument('--recipes', help='Recipe configuration file, defaults to all recipes')
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(args)
+
+    game_data = game_parse.get_docs()
+    if args.recipes is not None:
+        with open(args.recipes, 'r') as file:
+            recipe_config = AlternateRecipeConfiguration.from_dict(yaml.safe_load(file))
+    else:
+        recipe_config = AlternateRecipeConfiguration({
+            recipe_id: True for recipe_id in game_data.recipes
+        })
+
+    plan_paths = []
+    problems = []
+    errors = []
+    for plan_path in find_plans(args.plans):
+        try:
+            with open(plan_path, 'r') as file:
+                problems.append(Problem.from_dict(yaml.safe_load(file)))
+            plan_paths.append(plan_path)
+        except Exception as e:
+            errors.append((plan_path, e))
+
+    output = open(args.output, 'w') if args.output is not None else sys.stdout
+    try:
+        # A plan that fails gets an error record, the rest of the batch still runs
+        for plan_path, error in errors:
+            output.write(json.dumps({'plan': plan_path, 'error': str(error)}) + '\n')
+        for index, result, error in optimize_many(problems, game_data, recipe_config,
+                                                  args.backend, args.workers):
+            if error is not None:
+                record = {'plan': plan_paths[index], 'error': str(error)}
+            else:
+                record = {
+                    'plan': plan_paths[index],
+                    'result': result.to_dict() if result is not None else None
+                }
+            output.write(json.dumps(record) + '\n')
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
@@ -0,0 +1,208 @@
+import time
+
+import highspy
+import numpy as np
+
+from .solve import CompiledModel, FIRST_STAGE_TIME_SHARE, report_mip
+
+
+class HighsModel(CompiledModel):
+    """Recipe LP kept loaded in one in-process HiGHS session.
+
+    The power-minimization stage adds the target row to the model that just
+    solved the first stage, so HiGHS restarts from the optimal basis instead
+    of solving from scratch. The basis also carries over between problems.
+    """
+
+    def __init__(self, game_data, recipes, items, ratios=None):
+        super().__init__(game_data, recipes, items, ratios)
+        lp = highspy.HighsLp()
+        lp.num_col_ = len(self.columns)
+        lp.num_row_ = len(self.items)
+        lp.col_cost_ = np.zeros(len(self.columns))
+        lp.col_lower_ = np.zeros(len(self.columns))
+        lp.col_upper_ = np.full(len(self.columns), highspy.kHighsInf)
+        lp.row_lower_ = np.zeros(len(self.items))
+        lp.row_upper_ = np.full(len(self.items), highspy.kHighsInf)
+
+        starts = []
+        indices = []
+        values = []
+        for column in self.columns:
+            # Duplicate entries, such as water loops, are summed
+            entries = {}
+            for item_index, rate in column:
+                entries[item_index] = entries.get(item_index, 0) + rate
+            starts.append(len(indices))
+            indices.extend(sorted(entries))
+            values.extend(entries[item_index] for item_index in sorted(entries))
+        starts.append(len(indices))
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = np.array(starts, dtype=np.int32)
+        lp.a_matrix_.index_ = np.array(indices, dtype=np.int32)
+        lp.a_matrix_.value_ = np.array(values, dtype=float)
+
+        self.all_columns = np.arange(len(self.columns), dtype=np.int32)
+        self.power_vector = np.array(self.power, dtype=float)
+        self.row_upper = np.full(len(self.items), highspy.kHighsInf)
+        self.row_lower = np.zeros(len(self.items))
+
+        self.lp = lp
+        self.highs = highspy.Highs()
+        self.highs.setOptionValue('output_flag', False)
+        self.highs.passModel(lp)
+
+    @staticmethod
+    def record(highs, stats, stage):
+        stats.lap(stage)
+        stats.status = highs.modelStatusToString(highs.getModelStatus())
+        stats.iterations[stage] = highs.getInfo().simplex_iteration_count
+
+    def objective_arrays(self, problem):
+        indices, values, _ = self.objective_row(problem)
+        return np.array(indices, dtype=np.int32), np.array(values, dtype=float)
+
+    def solve(self, problem, stats):
+        stats.set_size(len(self.columns), len(self.items), self.nonzeros)
+        highs = self.highs
+        rhs = np.array(self.input_vector(problem.inputs), dtype=float)
+        constant = self.objective_constant(problem, rhs)
+        row_indices, row_values = self.objective_arrays(problem)
+
+        # Every item row reads matrix @ x >= -rhs, only push the rows that changed
+        row_lower = -rhs
+        changed = np.flatnonzero(row_lower != self.row_lower).astype(np.int32)
+        if len(changed) > 0:
+            highs.changeRowsBounds(len(changed), changed, row_lower[changed], self.row_upper[changed])
+            self.row_lower = row_lower
+        costs = np.zeros(len(self.columns))
+        costs[row_indices] = row_values
+        highs.changeColsCost(len(self.columns), self.all_columns, costs)
+        highs.changeObjectiveSense(highspy.ObjSense.kMaximize)
+        highs.run()
+        self.record(highs, stats, 'first')
+        if highs.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            return None
+        target_production = highs.getInfo().objective_function_value + constant
+        first = highs.getSolution()
+        # Raising an item's RHS lowers its row's lower bound
+        row_duals = (-np.array(first.row_dual)).tolist()
+        column_duals = list(first.col_dual)
+
+        highs.addRow(target_production - constant, highspy.kHighsInf,
+                     len(row_indices), row_indices, row_values)
+        target_label = np.array([len(self.items)], dtype=np.int32)
+        try:
+            highs.changeColsCost(len(self.columns), self.all_columns, self.power_vector)
+            highs.changeObjectiveSense(highspy.ObjSense.kMinimize)
+            highs.run()
+            self.record(highs, stats, 'second')
+            if highs.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+                return None
+            objective = highs.getInfo().objective_function_value
+            solution = highs.getSolution()
+            quantities = list(solution.col_value)
+            item_values = (np.array(solution.row_value[:len(self.items)]) + rhs).tolist()
+        finally:
+            highs.deleteRows(1, target_label)
+
+        return self.make_result(problem, objective, quantities, item_values, stats,
+                                row_duals, column_duals)
+
+    def integer_model(self, options):
+        """A fresh MIP over the LP plus an integer machine count per recipe.
+
+        Recipe j's quantity q_j must lie within [min_clock, max_clock] * n_j.
+        The machine counts follow all of the LP's columns.
+        """
+        recipes = len(self.recipes)
+        columns = len(self.columns)
+        highs = highspy.Highs()
+        highs.setOptionValue('output_flag', False)
+        highs.passModel(self.lp)
+        machines = np.arange(columns, columns + recipes, dtype=np.int32)
+        highs.addCols(recipes, np.zeros(recipes), np.zeros(recipes),
+                      np.full(recipes, highspy.kHighsInf), 0,
+                      np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0))
+        highs.changeColsIntegrality(recipes, machines,
+                                    np.full(recipes, highspy.HighsVarType.kInteger.value, dtype=np.uint8))
+
+        indices = np.column_stack([self.all_columns[:recipes], machines]).ravel()
+        starts = np.arange(0, 2 * recipes, 2, dtype=np.int32)
+        # q_j - max_clock * n_j <= 0
+        highs.addRows(recipes, np.full(recipes, -highspy.kHighsInf), np.zeros(recipes),
+                      2 * recipes, starts, indices,
+                      np.tile([1.0, -options.max_clock], recipes))
+        # q_j - min_clock * n_j >= 0
+        highs.addRows(recipes, np.zeros(recipes), np.full(recipes, highspy.kHighsInf),
+                      2 * recipes, starts, indices,
+                      np.tile([1.0, -options.min_clock], recipes))
+
+        if options.mip_gap is not None:
+            highs.setOptionValue('mip_rel_gap', options.mip_gap)
+        return highs
+
+    def solve_integer(self, problem, options, stats):
+        start = time.monotonic()
+        stats.set_size(*self.integer_size())
+        rhs = np.array(self.input_vector(problem.inputs), dtype=float)
+        constant = self.objective_constant(problem, rhs)
+        row_indices, row_values = self.objective_arrays(problem)
+        columns = len(self.columns)
+        total = columns + len(self.recipes)
+
+        highs = self.integer_model(options)
+        highs.changeRowsBounds(len(self.items), np.arange(len(self.items), dtype=np.int32),
+                               -rhs, np.full(len(self.items), highspy.kHighsInf))
+        costs = np.zeros(total)
+        costs[row_indices] = row_values
+        highs.changeColsCost(total, np.arange(total, dtype=np.int32), costs)
+        highs.changeObjectiveSense(highspy.ObjSense.kMaximize)
+        stats.lap('build')
+
+        stage = ['target', constant]
+
+        def report(event):
+            out = event.data_out
+            report_mip(stage[0], out.objective_function_value + stage[1],
+                       out.mip_dual_bound + stage[1], out.mip_gap)
+        highs.cbMipImprovingSolution.subscribe(report)
+
+        time_limit = options.time_left(start, FIRST_STAGE_TIME_SHARE)
+        if time_limit is not None:
+            highs.setOptionValue('time_limit', time_limit)
+        highs.run()
+        self.record(highs, stats, 'first')
+        # On a time limit HiGHS still hands back the best plan it found
+        if highs.getInfo().primal_solution_status != 2:
+            return None
+        target_production = highs.getInfo().objective_function_value + constant
+        mip_gap = highs.getInfo().mip_gap
+        first = highspy.HighsSolution()
+        first.col_value = list(highs.getSolution().col_value)
+
+        highs.addRow(target_production - constant, highspy.kHighsInf,
+                     len(row_indices), row_indices, row_values)
+        costs = np.zeros(total)
+        costs[columns:] = 1
+        highs.changeColsCost(total, np.arange(total, dtype=np.int32), costs)
+        highs.changeObjectiveSense(highspy.ObjSense.kMinimize)
+        # The first stage's plan is feasible here, so there is always a fallback
+        highs.setSolution(first)
+        stage[:] = ['machines', 0]
+        time_limit = options.time_left(start)
+        if time_limit is not None:
+            highs.setOptionValue('time_limit', time_limit)
+        highs.run()
+        self.record(highs, stats, 'second')
+        if highs.getInfo().primal_solution_status == 2:
+            values = np.array(highs.getSolution().col_value)
+        else:
+            values = np.array(first.col_value)
+
+        quantities = values[:columns].tolist()
+        return self.make_result(
+            problem, float(self.power_vector @ values[:columns]), quantities,
+            self.item_values(quantities, rhs.tolist()), stats,
+            machines=values[columns:].tolist(), mip_gap=mip_gap
+        )
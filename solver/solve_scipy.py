@@ -0,0 +1,148 @@
+import time
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+from scipy.sparse import csr_array, hstack, identity, vstack
+
+from .solve import CompiledModel, FIRST_STAGE_TIME_SHARE, report_mip
+
+# Status codes shared by linprog and milp
+STATUS_NAMES = {
+    0: 'Optimal',
+    1: 'Iteration or time limit',
+    2: 'Infeasible',
+    3: 'Unbounded',
+    4: 'Numerical difficulties'
+}
+
+
+class ScipyModel(CompiledModel):
+    """Recipe LP as a scipy.sparse CSR matrix, solved in-process by HiGHS"""
+
+    def __init__(self, game_data, recipes, items, ratios=None):
+        super().__init__(game_data, recipes, items, ratios)
+        item_indices = []
+        recipe_indices = []
+        rates = []
+        for recipe_index, column in enumerate(self.columns):
+            for item_index, rate in column:
+                item_indices.append(item_index)
+                recipe_indices.append(recipe_index)
+                rates.append(rate)
+        # Duplicate (item, recipe) entries, such as water loops, are summed
+        self.matrix = csr_array(
+            (rates, (item_indices, recipe_indices)),
+            shape=(len(self.items), len(self.columns))
+        )
+        self.neg_matrix = -self.matrix
+        self.power_vector = np.array(self.power, dtype=float)
+
+    @staticmethod
+    def record(result, stats, stage):
+        stats.lap(stage)
+        stats.status = STATUS_NAMES.get(result.status, result.message)
+        # milp only reports branch-and-bound nodes
+        iterations = getattr(result, 'nit', None)
+        if iterations is None:
+            iterations = getattr(result, 'mip_node_count', None)
+        if iterations is not None:
+            stats.iterations[stage] = iterations
+
+    def objective_vector(self, problem):
+        indices, values, _ = self.objective_row(problem)
+        objective = np.zeros(len(self.columns))
+        objective[indices] = values
+        return objective
+
+    def solve(self, problem, stats):
+        stats.set_size(len(self.columns), len(self.items), self.nonzeros)
+        rhs = np.array(self.input_vector(problem.inputs), dtype=float)
+        constant = self.objective_constant(problem, rhs)
+        objective = self.objective_vector(problem)
+
+        # Every item row reads matrix @ x + rhs >= 0
+        first = linprog(-objective, A_ub=self.neg_matrix,
+                        b_ub=rhs, bounds=(0, None), method='highs')
+        self.record(first, stats, 'first')
+        if first.status != 0:
+            return None
+        target_production = -first.fun + constant
+        # linprog minimizes -target, so its marginals have the opposite sign
+        row_duals = (-first.ineqlin.marginals).tolist()
+        column_duals = (-first.lower.marginals).tolist()
+
+        second = linprog(self.power_vector,
+                         A_ub=vstack([self.neg_matrix, csr_array(-objective[np.newaxis, :])],
+                                     format='csr'),
+                         b_ub=np.append(rhs, constant - target_production),
+                         bounds=(0, None), method='highs')
+        self.record(second, stats, 'second')
+        if second.status != 0:
+            return None
+
+        quantities = second.x
+        return self.make_result(
+            problem, second.fun, quantities.tolist(),
+            (self.matrix @ quantities + rhs).tolist(), stats,
+            row_duals, column_duals
+        )
+
+    def solve_integer(self, problem, options, stats):
+        start = time.monotonic()
+        stats.set_size(*self.integer_size())
+        rhs = np.array(self.input_vector(problem.inputs), dtype=float)
+        constant = self.objective_constant(problem, rhs)
+        objective = self.objective_vector(problem)
+        recipes = len(self.recipes)
+        columns = len(self.columns)
+
+        # Columns are the LP's columns q followed by recipe machine counts n,
+        # with min_clock * n <= q <= max_clock * n
+        eye = identity(recipes, format='csr')
+        quantity = hstack([eye, csr_array((recipes, columns - recipes))])
+        constraints = [
+            LinearConstraint(hstack([self.matrix, csr_array((len(self.items), recipes))]),
+                             -rhs, np.inf),
+            LinearConstraint(hstack([quantity, -options.max_clock * eye]), -np.inf, 0),
+            LinearConstraint(hstack([quantity, -options.min_clock * eye]), 0, np.inf)
+        ]
+        integrality = np.concatenate([np.zeros(columns), np.ones(recipes)])
+        bounds = Bounds(0, np.inf)
+
+        def milp_options(share=1.0):
+            # disp would log from HiGHS straight to stdout, progress is reported per stage
+            milp_options = {'disp': False}
+            time_limit = options.time_left(start, share)
+            if time_limit is not None:
+                milp_options['time_limit'] = time_limit
+            if options.mip_gap is not None:
+                milp_options['mip_rel_gap'] = options.mip_gap
+            return milp_options
+
+        costs = np.concatenate([objective, np.zeros(recipes)])
+        stats.lap('build')
+        first = milp(-costs, constraints=constraints, integrality=integrality,
+                     bounds=bounds, options=milp_options(FIRST_STAGE_TIME_SHARE))
+        self.record(first, stats, 'first')
+        # On a time limit HiGHS still hands back the best plan it found
+        if first.x is None:
+            return None
+        target_production = -first.fun + constant
+        report_mip('target', target_production, -first.mip_dual_bound + constant, first.mip_gap)
+
+        constraints.append(LinearConstraint(
+            costs[np.newaxis, :], target_production - constant, np.inf))
+        costs = np.concatenate([np.zeros(columns), np.ones(recipes)])
+        second = milp(costs, constraints=constraints, integrality=integrality,
+                      bounds=bounds, options=milp_options())
+        self.record(second, stats, 'second')
+        if second.x is not None:
+            report_mip('machines', second.fun, second.mip_dual_bound, second.mip_gap)
+        values = second.x if second.x is not None else first.x
+
+        quantities = values[:columns]
+        return self.make_result(
+            problem, float(self.power_vector @ quantities), quantities.tolist(),
+            (self.matrix @ quantities + rhs).tolist(), stats,
+            machines=values[columns:].tolist(), mip_gap=first.mip_gap
+        )
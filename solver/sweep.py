@@ -0,0 +1,136 @@
+import csv
+import itertools
+import sys
+
+from . import solve
+from .resources import ItemRate
+
+# Grids with at least this many points are solved across a process pool
+PARALLEL_THRESHOLD = 64
+
+
+class SweepPoint:
+    def __init__(self, rates, production, recipes, result):
+        self.rates = rates
+        self.production = production
+        self.recipes = recipes
+        self.result = result
+
+    def __repr__(self):
+        return f"SweepPoint({self.rates}, {self.production})"
+
+
+def grid(start, stop, steps):
+    if steps == 1:
+        return [start]
+    return [start + (stop - start) * step / (steps - 1) for step in range(steps)]
+
+
+def with_rates(problem, axes, rates):
+    """Copy of problem with the swept input items set to rates"""
+    swept = {item_id for item_id, _ in axes}
+    inputs = [ir for ir in problem.inputs if ir.resource not in swept]
+    inputs.extend(ItemRate(item_id, rate) for (item_id, _), rate in zip(axes, rates))
+    return solve.Problem(problem.targets, inputs, problem.ratio)
+
+
+def sweep(problem, game_data, recipe_config, axes, backend=solve.DEFAULT_BACKEND, max_workers=None):
+    """Solve problem over a grid of input rates.
+
+    axes is a list of one or two (item id, rates) pairs that replace those
+    inputs of problem. Returns the SweepPoints in grid order and the
+    breakpoints, (point, point) pairs of grid neighbours whose active recipe
+    sets differ.
+    """
+    assert 1 <= len(axes) <= 2, "Sweep one or two inputs"
+    grid_rates = list(itertools.product(*(rates for _, rates in axes)))
+    problems = [with_rates(problem, axes, rates) for rates in grid_rates]
+
+    if len(problems) >= PARALLEL_THRESHOLD:
+        results = [None] * len(problems)
+        for index, result, error in solve.optimize_many(problems, game_data, recipe_config,
+                                                        backend, max_workers):
+            # Fail like the serial path does
+            if error is not None:
+                raise error
+            results[index] = result
+    else:
+        # Consecutive points share a problem shape, so this re-solves one model
+        model = solve.compile_model(game_data, recipe_config, backend)
+        results = [model.solve(point_problem) for point_problem in problems]
+
+    points = []
+    for rates, result in zip(grid_rates, results):
+        production = None
+        recipes = None
+        if result is not None:
+            production = sum(
+                ir.rate * problem.targets[ir.resource] for ir in result.outputs
+                if ir.resource in problem.targets
+            )
+            recipes = frozenset(result.recipes)
+        points.append(SweepPoint(rates, production, recipes, result))
+
+    breakpoints = []
+    columns = len(axes[-1][1])
+    for index, point in enumerate(points):
+        neighbours = [index + 1] if (index + 1) % columns != 0 else []
+        if len(axes) == 2:
+            neighbours.append(index + columns)
+        for neighbour in neighbours:
+            if neighbour < len(points) and points[neighbour].recipes != point.recipes:
+                breakpoints.append((point, points[neighbour]))
+    return points, breakpoints
+
+
+def main(args):
+    import argparse
+    from . import game_parse
+    from .config import AlternateRecipeConfiguration
+
+    parser = argparse.ArgumentParser(prog='python -m solver sweep')
+    parser.add_argument('target', help=solve.TARGET_HELP)
+    parser.add_argument('--ratio', action='store_true',
+                        help='Treat target weights as required output ratios')
+    parser.add_argument('item', help='Input item to sweep')
+    parser.add_argument('start', type=float)
+    parser.add_argument('stop', type=float)
+    parser.add_argument('steps', type=int)
+    parser.add_argument('inputs', nargs='*',
+                        help='Alternating fixed input item ids and rates')
+    parser.add_argument('--second', nargs=4, metavar=('ITEM', 'START', 'STOP', 'STEPS'),
+                        help='Second input to sweep over')
+    parser.add_argument('--backend', choices=solve.BACKENDS, default=solve.DEFAULT_BACKEND)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(args)
+    if len(args.inputs) % 2 != 0:
+        parser.error('every input item needs a rate')
+    it = iter(args.inputs)
+    inputs = [ItemRate(id, int(rate)) for id, rate in zip(it, it)]
+
+    axes = [(args.item, grid(args.start, args.stop, args.steps))]
+    if args.second is not None:
+        item, start, stop, steps = args.second
+        axes.append((item, grid(float(start), float(stop), int(steps))))
+
+    game_data = game_parse.get_docs()
+    recipe_config = AlternateRecipeConfiguration({
+        recipe_id: True for recipe_id in game_data.recipes
+    })
+    problem = solve.Problem(solve.parse_targets(args.target), inputs, args.ratio)
+    points, breakpoints = sweep(problem, game_data,
+                                recipe_config, axes, args.backend, args.workers)
+
+    # Weighted targets are written as given, commas and all, so quote as needed
+    writer = csv.writer(sys.stdout, lineterminator='\n')
+    writer.writerow([item_id for item_id, _ in axes] + [args.target, 'recipes'])
+    for point in points:
+        recipes = ' '.join(sorted(point.recipes)) if point.recipes is not None else 'infeasible'
+        production = point.production if point.production is not None else ''
+        writer.writerow([f"{rate:g}" for rate in point.rates] + [f"{production}", recipes])
+
+    print("--- Breakpoints ---")
+    for before, after in breakpoints:
+        added = sorted((after.recipes or frozenset()) - (before.recipes or frozenset()))
+        removed = sorted((before.recipes or frozenset()) - (after.recipes or frozenset()))
+        print(f"{before.rates} -> {after.rates}: +{added} -{removed}")
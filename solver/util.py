@@ -17,10 +17,10 @@ def to_from_dict(fields, manual_fields=[]):
 
         def to_dict(self):
             d = {
-                field: self.__dict__[field] for field in fields
+                field: getattr(self, field) for field in fields
             }
             d.update({
-                field: self.__dict__[field] for field, _ in manual_fields
+                field: getattr(self, field) for field, _ in manual_fields
             })
             return d
         setattr(c, 'from_dict', from_dict)
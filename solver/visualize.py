@@ -2,7 +2,16 @@ import math
 import pygraphviz as pgv
 
 
-def visualize(result, game_data, image_file=None, dot_file=None, layout='dot', recipe_distribute=True):
+def visualize(result, game_data, image_file=None, dot_file=None, layout='dot', recipe_distribute=True,
+              image_format=None, stats=None):
+    """Lay out the result, writing image_file and/or dot_file.
+
+    Without an image_file, an image_format such as 'svg' returns the rendered
+    image as bytes instead of touching the disk. Pass the result's stats to
+    add the graph, layout and render times to them.
+    """
+    if stats is not None:
+        stats.restart()
     graph = pgv.AGraph(directed=True, strict=True,
                        name=repr(result.problem.target))
 
@@ -48,9 +57,12 @@ def visualize(result, game_data, image_file=None, dot_file=None, layout='dot', r
         )
 
         distribute_string = ""
-        num_machines = math.ceil(quantity)
-        if recipe_distribute and num_machines > 1:
+        if result.machines is not None:
+            # Integer solves already chose the machine count
+            num_machines = result.machines.get(recipe.id, 0)
+        else:
             num_machines = math.ceil(quantity)
+        if recipe_distribute and num_machines > 1:
             per_machine = round(quantity / num_machines, 3)
             distribute_string = f'(x{num_machines} @ {per_machine})\n'
 
@@ -66,7 +78,19 @@ def visualize(result, game_data, image_file=None, dot_file=None, layout='dot', r
 
     if dot_file is not None:
         graph.write(dot_file)
-
+    if stats is not None:
+        stats.lap('graph')
+
+    if image_file is None and image_format is None:
+        return None
+    graph.layout(prog=layout)
+    if stats is not None:
+        stats.lap('layout')
     if image_file is not None:
-        graph.layout(prog=layout)
-        graph.draw(image_file)
+        graph.draw(image_file, format=image_format)
+        image = None
+    else:
+        image = graph.draw(format=image_format)
+    if stats is not None:
+        stats.lap('render')
+    return image
@@ -1,22 +1,111 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
-import re
-from os import listdir, path, makedirs
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from os import path, makedirs, remove, replace
+import argparse
+import json
 import shutil
+import threading
 
 BASE_URL = "https://satisfactory.fandom.com"
 BASE_CAT = "/wiki/Category:Icons"
 BASE_DIR = "./icons"
+MANIFEST = "manifest.json"
+WORKERS = 8
 
 
-def scrape():
-    scrape_category(BASE_CAT, BASE_DIR)
+def make_session(workers=WORKERS):
+    """One pooled session, sized so every worker keeps its connection alive"""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5,
+                  status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers,
+                          max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
-def download_file(url, path):
-    with requests.get(url, stream=True) as r:
-        with open(path, "wb") as f:
-            shutil.copyfileobj(r.raw, f)
+class Manifest:
+    """Validators of every downloaded icon, keyed by its path under BASE_DIR.
+
+    Saved after each category, so an interrupted run resumes with
+    conditional requests instead of downloading everything again.
+    """
+
+    def __init__(self, dir):
+        self.path = path.join(dir, MANIFEST)
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+
+    def save(self):
+        with self.lock:
+            encoded = json.dumps(self.entries, indent=1, sort_keys=True)
+        with open(self.path + ".part", "w") as f:
+            f.write(encoded)
+        replace(self.path + ".part", self.path)
+
+
+def conditional_headers(entry, url, file_path):
+    if not path.isfile(file_path):
+        return {}
+    if entry is None or entry.get("url") != url:
+        # Downloaded before the manifest existed, trust the file's age
+        return {"If-Modified-Since": formatdate(path.getmtime(file_path), usegmt=True)}
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def download_file(session, url, file_path, manifest, key):
+    """Fetch url to file_path unless unchanged, returns whether it was written"""
+    headers = conditional_headers(manifest.get(key), url, file_path)
+    with session.get(url, stream=True, headers=headers, timeout=30) as r:
+        if r.status_code == 304:
+            if manifest.get(key) is None:
+                manifest.set(key, {"url": url,
+                                   "etag": r.headers.get("ETag"),
+                                   "last_modified": r.headers.get("Last-Modified")})
+            return False
+        r.raise_for_status()
+        # A half-written icon never takes the real name
+        part_path = file_path + ".part"
+        try:
+            with open(part_path, "wb") as f:
+                r.raw.decode_content = True
+                shutil.copyfileobj(r.raw, f)
+            # urllib3 1.x hands back a short body without complaint, so count
+            # what came over the wire ourselves
+            expected = r.headers.get("Content-Length")
+            if expected is not None and r.raw.tell() != int(expected):
+                raise IOError(f"{url} ended after {r.raw.tell()} of {expected} bytes")
+        except BaseException:
+            if path.exists(part_path):
+                remove(part_path)
+            raise
+        replace(part_path, file_path)
+        manifest.set(key, {"url": url,
+                           "etag": r.headers.get("ETag"),
+                           "last_modified": r.headers.get("Last-Modified")})
+        return True
 
 
 def get_subcategory(soup):
@@ -35,27 +124,53 @@ def get_icons(soup):
     return {url.rsplit("/")[-1]: url for url in urls}
 
 
-def scrape_category(cat, dir):
+def scrape_category(session, pool, manifest, cat, dir, base_dir=BASE_DIR, base_url=BASE_URL):
     print(f"Scraping {cat}")
     makedirs(dir, exist_ok=True)
-    r = requests.get(BASE_URL + cat)
+    r = session.get(base_url + cat, timeout=30)
     if r.status_code != 200:
         raise RuntimeError(
             f"Scrape: {cat} returned non-zero error code {r.status_code}"
         )
     soup = BeautifulSoup(r.text, "html.parser")
-    files = set(f for f in listdir(dir) if path.isfile(path.join(dir, f)))
     icons = get_icons(soup)
-    for icon, url in icons.items():
-        if icon in files:
-            print(f" -- Skip {icon}")
-        else:
-            print(f" -- Get  {icon}")
-            download_file(url, path.join(dir, icon))
+    downloads = {
+        icon: pool.submit(download_file, session, url, path.join(dir, icon), manifest,
+                          path.relpath(path.join(dir, icon), base_dir))
+        for icon, url in icons.items()
+    }
+    for icon, download in downloads.items():
+        print(f" -- {'Get ' if download.result() else 'Skip'} {icon}")
+    manifest.save()
 
     subcats = get_subcategory(soup)
     for name, subcat in subcats.items():
-        scrape_category(subcat, path.join(dir, name))
+        scrape_category(session, pool, manifest, subcat, path.join(dir, name),
+                        base_dir, base_url)
+
+
+def scrape(base_url=BASE_URL, cat=BASE_CAT, dir=BASE_DIR, workers=WORKERS):
+    makedirs(dir, exist_ok=True)
+    manifest = Manifest(dir)
+    try:
+        with make_session(workers) as session, ThreadPoolExecutor(workers) as pool:
+            scrape_category(session, pool, manifest, cat, dir, dir, base_url)
+    finally:
+        # After the pool has shut down, so downloads still running when
+        # another failed are recorded too
+        manifest.save()
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Download the wiki's icons")
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--category', default=BASE_CAT)
+    parser.add_argument('--dir', default=BASE_DIR)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_args(args)
+    scrape(args.base_url, args.category, args.dir, args.workers)
 
 
-scrape()
+if __name__ == "__main__":
+    import sys
+    main(sys.argv[1:])
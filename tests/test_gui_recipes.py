@@ -0,0 +1,96 @@
+"""The recipe tree model and window, on Qt's offscreen platform.
+
+Run from the repository root with `python -m unittest tests.test_gui_recipes`.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import PySide6.QtCore as qtc
+import PySide6.QtWidgets as qtw
+
+from solver.game_parse import GameData, Item, Machine, Recipe
+from solver.gui_recipes import AlternateRecipeWindow, TreeModel
+
+
+def make_game_data():
+    items = {
+        item_id: Item(item_id, item_id, "", "RF_SOLID", "", True)
+        for item_id in ("Ore", "Coal", "Plate", "Rod")
+    }
+    machines = {"Smelter": Machine("Smelter", "Smelter", "", 4.0, "")}
+    recipes = {
+        recipe.id: recipe for recipe in [
+            Recipe("Plate", "Plate", {"Ore": 1}, {"Plate": 1}, "Smelter", 1.0,
+                   ["Milestones", "Tier 1"]),
+            Recipe("Rod", "Rod", {"Ore": 1}, {"Rod": 1}, "Smelter", 1.0,
+                   ["Milestones", "Tier 1"]),
+            Recipe("Coal Plate", "CoalPlate", {"Coal": 2}, {"Plate": 1}, "Smelter", 1.0,
+                   ["Alternate Recipes"]),
+        ]
+    }
+    return GameData(items, recipes, machines)
+
+
+class RecipeTreeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = qtw.QApplication.instance() or qtw.QApplication([])
+
+    def setUp(self):
+        self.game_data = make_game_data()
+        self.model = TreeModel(AlternateRecipeWindow.build_tree(self.game_data))
+        self.signals = []
+        self.model.dataChanged.connect(lambda *_: self.signals.append("dataChanged"))
+        self.model.modelReset.connect(lambda: self.signals.append("modelReset"))
+
+    def states(self):
+        return {item.get_display(): item.checked for item in self.model.label_items()} | {
+            recipe_id: item.checked for recipe_id, item in self.model.item_lookup.items()
+        }
+
+    def test_apply_states_sets_every_item_in_one_reset(self):
+        self.model.apply_states(lambda recipe_id: recipe_id != "Rod")
+        self.assertEqual(self.states(), {
+            "Alternate Recipes": qtc.Qt.Checked,
+            "Milestones": qtc.Qt.PartiallyChecked,
+            "Tier 1": qtc.Qt.PartiallyChecked,
+            "Plate": qtc.Qt.Checked,
+            "Rod": qtc.Qt.Unchecked,
+            "CoalPlate": qtc.Qt.Checked,
+        })
+        self.assertEqual(self.signals, ["modelReset"])
+
+        self.signals.clear()
+        self.model.check_all(True)
+        self.assertEqual(set(self.states().values()), {qtc.Qt.Checked})
+        self.assertEqual(self.signals, ["modelReset"])
+
+    def test_unchanged_states_emit_nothing(self):
+        self.model.check_all(False)
+        self.signals.clear()
+        self.model.apply_states(lambda recipe_id: False)
+        self.assertEqual(set(self.states().values()), {qtc.Qt.Unchecked})
+        self.assertEqual(self.signals, [])
+
+    def test_window_keeps_rows_expanded(self):
+        with tempfile.TemporaryDirectory() as config_home, \
+                mock.patch.dict(os.environ, {"XDG_CONFIG_HOME": config_home}):
+            window = AlternateRecipeWindow(self.game_data)
+        model = window.recipe_model
+        milestones, tier = [item for item in model.label_items()
+                            if item.get_display() in ("Milestones", "Tier 1")]
+        window.recipe_view.setExpanded(model.item_index(milestones), True)
+        window.recipe_view.setExpanded(model.item_index(tier), True)
+
+        model.check_all(False)
+        self.assertTrue(window.recipe_view.isExpanded(model.item_index(milestones)))
+        self.assertTrue(window.recipe_view.isExpanded(model.item_index(tier)))
+        self.assertEqual(window.to_recipe_config().enabled_ids(), frozenset())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""Solver results on a small made-up game.
+
+Run from the repository root with `python -m unittest tests.test_solve`.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+from solver import solve
+from solver.config import AlternateRecipeConfiguration
+from solver.game_parse import GameData, Item, Machine, Recipe
+from solver.resources import ItemRate
+
+# Step of the finite-difference check, small enough to stay on one LP basis
+STEP = 0.5
+# PuLP's HiGHS interface doesn't read duals back
+DUAL_BACKENDS = [backend for backend in solve.BACKENDS if backend != "pulp-highs"]
+
+
+def make_game_data():
+    items = {
+        item_id: Item(item_id, item_id, "", "RF_SOLID", "", True)
+        for item_id in ("Ore", "Coal", "Scrap", "Plate")
+    }
+    machines = {"Smelter": Machine("Smelter", "Smelter", "", 4.0, "")}
+    recipes = {
+        recipe.id: recipe for recipe in [
+            Recipe("Plate", "Plate", {"Ore": 1}, {"Plate": 1}, "Smelter", 1.0, None),
+            Recipe("Coal Plate", "CoalPlate", {"Coal": 2}, {"Plate": 1}, "Smelter", 1.0, None),
+            # Never worth running, so it only shows up as a reduced cost
+            Recipe("Scrap Plate", "ScrapPlate", {"Ore": 3, "Coal": 1}, {"Plate": 1},
+                   "Smelter", 1.0, None),
+        ]
+    }
+    return GameData(items, recipes, machines)
+
+
+class ShadowPriceTest(unittest.TestCase):
+    def setUp(self):
+        self.game_data = make_game_data()
+        self.recipe_config = AlternateRecipeConfiguration({
+            recipe_id: True for recipe_id in self.game_data.recipes
+        })
+
+    def optimize(self, inputs, backend):
+        problem = solve.Problem("Plate", [ItemRate(item_id, rate) for item_id, rate in inputs.items()])
+        with contextlib.redirect_stderr(io.StringIO()):
+            return solve.optimize(problem, self.game_data, self.recipe_config, backend)
+
+    @staticmethod
+    def plates(result):
+        # The objective is the second stage's power, not the target output
+        return sum(ir.rate for ir in result.outputs if ir.resource == "Plate")
+
+    def test_shadow_prices_match_finite_differences(self):
+        for backend in DUAL_BACKENDS:
+            # Coal at rate 0 is still an input, and extra Coal makes more Plate
+            for inputs in ({"Ore": 10, "Coal": 0}, {"Ore": 10, "Coal": 6}, {"Ore": 0, "Coal": 6}):
+                with self.subTest(backend=backend, inputs=inputs):
+                    result = self.optimize(inputs, backend)
+                    for item_id in inputs:
+                        more = self.optimize(dict(inputs, **{item_id: inputs[item_id] + STEP}), backend)
+                        expected = (self.plates(more) - self.plates(result)) / STEP
+                        self.assertAlmostEqual(result.shadow_prices.get(item_id, 0), expected,
+                                               places=5, msg=item_id)
+
+    def test_reduced_cost_of_unused_recipe_at_rate_zero(self):
+        for backend in DUAL_BACKENDS:
+            with self.subTest(backend=backend):
+                result = self.optimize({"Ore": 10, "Coal": 0}, backend)
+                # One plate costs 3 Ore and 1 Coal, worth 3 + 0.5 plates elsewhere
+                self.assertAlmostEqual(result.reduced_costs.get("ScrapPlate", 0), -2.5, places=5)
+
+
+@contextlib.contextmanager
+def captured_stdout():
+    """Everything written to stdout, including by solver binaries and C++ libraries"""
+    output = io.StringIO()
+    with tempfile.TemporaryFile() as capture:
+        sys.stdout.flush()
+        saved = os.dup(1)
+        os.dup2(capture.fileno(), 1)
+        try:
+            with contextlib.redirect_stdout(output):
+                yield output
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved, 1)
+            os.close(saved)
+            capture.seek(0)
+            output.write(capture.read().decode(errors="replace"))
+
+
+class QuietSolveTest(unittest.TestCase):
+    def test_solvers_leave_stdout_alone(self):
+        game_data = make_game_data()
+        recipe_config = AlternateRecipeConfiguration({
+            recipe_id: True for recipe_id in game_data.recipes
+        })
+        problem = solve.Problem("Plate", [ItemRate("Ore", 10), ItemRate("Coal", 3)])
+        for backend in solve.BACKENDS:
+            for integer in (None, solve.IntegerOptions()):
+                with self.subTest(backend=backend, integer=integer is not None):
+                    progress = io.StringIO()
+                    with captured_stdout() as output, contextlib.redirect_stderr(progress):
+                        result = solve.optimize(problem, game_data, recipe_config, backend, integer)
+                    self.assertIsNotNone(result)
+                    self.assertEqual(output.getvalue(), "")
+                    if integer is not None:
+                        self.assertIn("MIP target", progress.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,258 @@
+"""wiki_scrape against a local http.server standing in for the wiki.
+
+Run from the repository root with `python -m unittest tests.test_wiki_scrape`.
+"""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from urllib3.response import HTTPResponse
+
+from solver import wiki_scrape
+
+# Served with an ETag only, except LAST_MODIFIED_ONLY which has no ETag
+LAST_MODIFIED_ONLY = "Water.png"
+LAST_MODIFIED = formatdate(1600000000, usegmt=True)
+
+
+def category_page(icons, subcategories):
+    gallery = "".join(
+        f'<li class="gallerybox"><a href="{{base}}/img/{icon}/revision/latest?cb=1">{icon}</a></li>'
+        for icon in icons
+    )
+    labels = "".join(
+        f'<a class="CategoryTreeLabel" href="/wiki/Category:{name}">{name} icons</a>'
+        for name in subcategories
+    )
+    return f"<html><body>{labels}<ul>{gallery}</ul></body></html>"
+
+
+class FakeWikiServer(ThreadingHTTPServer):
+    # Room for every worker's connection, so none is refused and retried
+    request_queue_size = 64
+
+
+class FakeWiki:
+    """Category pages and icons, with conditional GETs and injectable faults"""
+
+    def __init__(self):
+        self.pages = {
+            "Icons": category_page(["Logo.png"], ["Item", "Fluid"]),
+            "Item": category_page(["Iron_Plate.png", "Screw.png", "Wire.png"], []),
+            "Fluid": category_page([LAST_MODIFIED_ONLY], []),
+        }
+        self.icons = {
+            name: f"icon {name}".encode() * 50
+            for name in ("Logo.png", "Iron_Plate.png", "Screw.png", "Wire.png", LAST_MODIFIED_ONLY)
+        }
+        self.missing = set()
+        self.truncated = set()
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = FakeWikiServer(("127.0.0.1", 0), self.handler())
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def icon_statuses(self):
+        """{icon: [status, ...]} of the icon requests since the last call"""
+        with self.lock:
+            requests, self.requests = self.requests, []
+        statuses = {}
+        for name, status in requests:
+            statuses.setdefault(name, []).append(status)
+        return statuses
+
+    def handler(wiki):
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def send(self, status, body=b"", headers=()):
+                self.send_response(status)
+                for key, value in headers:
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith("/wiki/Category:"):
+                    page = wiki.pages.get(self.path.split(":", 1)[1])
+                    if page is None:
+                        return self.send(404)
+                    return self.send(200, page.replace("{base}", wiki.base_url).encode())
+                if self.path.startswith("/img/"):
+                    return self.icon(self.path[len("/img/"):])
+                self.send(404)
+
+            def icon(self, name):
+                status = self.icon_response(name)
+                with wiki.lock:
+                    wiki.requests.append((name, status))
+
+            def icon_response(self, name):
+                if name in wiki.missing or name not in wiki.icons:
+                    self.send(404)
+                    return 404
+                data = wiki.icons[name]
+                if name == LAST_MODIFIED_ONLY:
+                    validators = [("Last-Modified", LAST_MODIFIED)]
+                    since = self.headers.get("If-Modified-Since")
+                    unchanged = since is not None and \
+                        parsedate_to_datetime(since) >= parsedate_to_datetime(LAST_MODIFIED)
+                else:
+                    etag = '"%s"' % hashlib.md5(data).hexdigest()
+                    validators = [("ETag", etag)]
+                    unchanged = self.headers.get("If-None-Match") == etag
+                if unchanged:
+                    self.send(304, headers=validators)
+                    return 304
+                if name in wiki.truncated:
+                    # Promise the whole icon, send half and hang up
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data[:len(data) // 2])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return 200
+                self.send(200, data, validators)
+                return 200
+
+        return Handler
+
+
+class WikiScrapeTest(unittest.TestCase):
+    def setUp(self):
+        self.wiki = FakeWiki()
+        self.addCleanup(self.wiki.close)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dir = os.path.join(self.tmp.name, "icons")
+
+    def scrape(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            wiki_scrape.scrape(self.wiki.base_url, "/wiki/Category:Icons", self.dir, workers=4)
+        return self.wiki.icon_statuses()
+
+    def icon_path(self, key):
+        return os.path.join(self.dir, key)
+
+    def manifest(self):
+        with open(os.path.join(self.dir, wiki_scrape.MANIFEST)) as f:
+            return json.load(f)
+
+    def leftover_parts(self):
+        return [name for _, _, files in os.walk(self.dir) for name in files
+                if name.endswith(".part")]
+
+    def test_first_run_downloads_everything(self):
+        statuses = self.scrape()
+        self.assertEqual(statuses, {name: [200] for name in self.wiki.icons})
+        for key, name in (("Logo.png", "Logo.png"), ("Item/Screw.png", "Screw.png"),
+                          ("Fluid/Water.png", "Water.png")):
+            with open(self.icon_path(key), "rb") as f:
+                self.assertEqual(f.read(), self.wiki.icons[name])
+        manifest = self.manifest()
+        self.assertEqual(sorted(manifest), sorted([
+            "Logo.png", "Item/Iron_Plate.png", "Item/Screw.png", "Item/Wire.png",
+            "Fluid/Water.png"]))
+        self.assertTrue(manifest["Item/Screw.png"]["etag"])
+        self.assertEqual(manifest["Fluid/Water.png"]["last_modified"], LAST_MODIFIED)
+        self.assertEqual(self.leftover_parts(), [])
+
+    def test_unchanged_icons_are_skipped_with_304(self):
+        self.scrape()
+        before = os.path.getmtime(self.icon_path("Item/Screw.png"))
+        statuses = self.scrape()
+        # ETag icons through If-None-Match, Water.png through If-Modified-Since
+        self.assertEqual(statuses, {name: [304] for name in self.wiki.icons})
+        self.assertEqual(os.path.getmtime(self.icon_path("Item/Screw.png")), before)
+
+    def test_changed_icon_is_fetched_again(self):
+        self.scrape()
+        self.wiki.icons["Wire.png"] = b"new wire" * 50
+        statuses = self.scrape()
+        self.assertEqual(statuses.pop("Wire.png"), [200])
+        self.assertEqual(set(sum(statuses.values(), [])), {304})
+        with open(self.icon_path("Item/Wire.png"), "rb") as f:
+            self.assertEqual(f.read(), b"new wire" * 50)
+
+    def test_interrupted_run_resumes_from_manifest(self):
+        self.wiki.missing.add("Screw.png")
+        with self.assertRaises(Exception):
+            self.scrape()
+        self.assertFalse(os.path.exists(self.icon_path("Item/Screw.png")))
+        # Everything fetched before the failure was recorded
+        manifest = self.manifest()
+        self.assertIn("Logo.png", manifest)
+        self.assertIn("Item/Iron_Plate.png", manifest)
+        self.assertIn("Item/Wire.png", manifest)
+        self.wiki.icon_statuses()
+
+        self.wiki.missing.clear()
+        statuses = self.scrape()
+        self.assertEqual(statuses["Screw.png"], [200])
+        self.assertEqual(statuses["Logo.png"], [304])
+        self.assertEqual(statuses["Iron_Plate.png"], [304])
+        self.assertEqual(statuses["Wire.png"], [304])
+        self.assertIn("Item/Screw.png", self.manifest())
+
+    def check_truncated_download(self):
+        self.scrape()
+        old_icon = self.wiki.icons["Screw.png"]
+        self.wiki.icons["Screw.png"] = b"new screw" * 50
+        self.wiki.truncated.add("Screw.png")
+        with self.assertRaises(Exception):
+            self.scrape()
+        # The good icon stays and the partial body is thrown away
+        with open(self.icon_path("Item/Screw.png"), "rb") as f:
+            self.assertEqual(f.read(), old_icon)
+        self.assertEqual(self.leftover_parts(), [])
+
+        self.wiki.truncated.clear()
+        self.scrape()
+        with open(self.icon_path("Item/Screw.png"), "rb") as f:
+            self.assertEqual(f.read(), b"new screw" * 50)
+        self.assertEqual(self.leftover_parts(), [])
+
+    def test_truncated_download_never_replaces_the_icon(self):
+        self.check_truncated_download()
+
+    def test_truncated_download_without_urllib3_length_check(self):
+        # urllib3 1.x, as requests~=2.25 resolves to, doesn't enforce Content-Length
+        original = HTTPResponse.__init__
+
+        def lenient(response, *args, **kwargs):
+            kwargs["enforce_content_length"] = False
+            original(response, *args, **kwargs)
+        with mock.patch.object(HTTPResponse, "__init__", lenient):
+            self.check_truncated_download()
+
+    def test_icons_from_before_the_manifest_are_revalidated_by_age(self):
+        self.scrape()
+        os.remove(os.path.join(self.dir, wiki_scrape.MANIFEST))
+        # Downloaded after the server's Last-Modified, so still current
+        now = time.time()
+        os.utime(self.icon_path("Fluid/Water.png"), (now, now))
+        statuses = self.scrape()
+        self.assertEqual(statuses[LAST_MODIFIED_ONLY], [304])
+        self.assertIn("Fluid/Water.png", self.manifest())
+
+
+if __name__ == "__main__":
+    unittest.main()